@@ -15,7 +15,7 @@ a model, and for balancing a model using the constraint, to get a new model
 satisfying the constraint.
 """
 from typing import Dict, Union, Callable
-
+import numpy as np
 
 
 class Constraint:
@@ -134,6 +134,31 @@ class Expr:
     def __le__(self, other):
         return Constraint(self, other)
 
+    def coefficients(self) -> tuple[Dict[str, float], float]:
+        """
+        Return the expression in linear form, as a dictionary of variable
+        coefficients and a constant term
+        """
+        if self.op is None:
+            if type(self.value) == str:
+                return ({self.value: 1.0}, 0.0)
+            return ({}, float(self.value))
+        left, left_const = self.value.coefficients()
+        right, right_const = self.right.coefficients()
+        if self.op == '+':
+            merged = dict(left)
+            for var, coeff in right.items():
+                merged[var] = merged.get(var, 0.0) + coeff
+            return (merged, left_const + right_const)
+        elif self.op == '*':
+            if left and right:
+                raise ValueError(f"Expression {self} is not linear")
+            coeffs, const, scale = (right, right_const, left_const) if not left \
+                else (left, left_const, right_const)
+            return ({var: scale * c for var, c in coeffs.items()}, scale * const)
+        else:
+            raise ValueError(f"Unknown operator {self.op}")
+
     def getVars(self):
         """
         Return a list of all the variables in the expression
@@ -191,6 +216,21 @@ def split_constraints(constraints : list[Union[Constraint, ConstraintPair]]) ->
       left.append(c)
   return (left, right)
 
+def compile_constraints(constraints : list[Constraint], variables : list[str]) -> tuple[np.ndarray, np.ndarray]:
+  """
+  Compile linear constraints into a matrix A and vector b over the given
+  variable ordering, so that a batch of models X (one row per model and
+  one column per variable) satisfies every constraint where X @ A.T <= b
+  """
+  A = np.zeros((len(constraints), len(variables)))
+  b = np.zeros(len(constraints))
+  for i, constraint in enumerate(constraints):
+    coeffs, const = constraint.left.coefficients()
+    for var, coeff in coeffs.items():
+      A[i, variables.index(var)] += coeff
+    b[i] = constraint.right - const
+  return (A, b)
+
 # Generate a LaTeX representation of the constraints in specification.tex
 def generateLatexSpecification(constraints : list[Constraint]):
   """
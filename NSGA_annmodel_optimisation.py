@@ -11,6 +11,9 @@ import numpy as np
 import torch
 import surrogate as sr
 import optimiser as op
+import datastore as ds
+import pareto_archive as pa
+import hypervolume as hvt
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mtk
 from apollo import mechanics as ma
@@ -20,7 +23,6 @@ from pymoo.operators.mutation.pm import PM
 from pymoo.operators.sampling.rnd import FloatRandomSampling
 from pymoo.termination import get_termination
 from pymoo.optimize import minimize
-from pymoo.indicators.hv import Hypervolume
 from pymoo.decomposition.asf import ASF
 
 
@@ -29,16 +31,15 @@ ma.textstyle()
 
 
 ### Data import, feature-target identification, and datasplit
-df  = pd.read_csv('data/miniLUSP_output.csv')
-columns = df.columns.tolist()
-features = columns[1:9]
-targets = columns[9:]
-xspace = ma.featurelocator(df, features)
-yspace = ma.featurelocator(df, targets)
+df = ds.load_table('data/miniLUSP_output.csv')
+features = df.features
+targets = df.targets
+xspace = df.xspace
+yspace = df.yspace
 
 
 config = op.OptimizerConfig()
-net = torch.load('model.pt')
+net = op.load_surrogate(config)
 problem = op.LandscapeOptimisation(net)
 
 algorithm = NSGA2(
@@ -86,13 +87,10 @@ for algo in hist:
 approx_ideal = F.min(axis=0)
 approx_nadir = F.max(axis=0)
 
-metric = Hypervolume(ref_point= np.array([1.1, 1.1, 1.1]),
-                      norm_ref_point=False,
-                      zero_to_one=True,
-                      ideal=approx_ideal,
-                      nadir=approx_nadir)
-
-hv = [metric.do(_F) for _F in hist_F]
+convergence = hvt.track_history(hist_F, n_evals, ref_point=[1.1, 1.1, 1.1],
+                                ideal=approx_ideal, nadir=approx_nadir)
+convergence.to_csv('Convergence.csv')
+hv = convergence['Hypervolume']
 
 plt.figure(figsize=(7, 5))
 plt.plot(n_evals, hv,  color='black', lw=0.7, label="Avg. CV of Pop")
@@ -198,14 +196,12 @@ decomp = ASF()
 i = decomp.do(nF, 1/weights).argmin()
 
 full = np.hstack((X, F))
-col_list = df.columns.to_list()[1:]
+col_list = df.columns[1:]
 full_pareto = pd.DataFrame(full, columns=col_list)
 
 full_pareto['food_rel'] = full_pareto['food_rel']*-1
 full_pareto['birds_rel'] = full_pareto['birds_rel']*-1
 partial_pareto = full_pareto[full_pareto.food_rel>0.9]
 
-solution_set = pd.DataFrame(np.hstack((X,F)), columns=df.columns.to_list()[1:])
-solution_set['food_rel'] = solution_set['food_rel']*-1
-solution_set['birds_rel'] = solution_set['birds_rel']*-1
+solution_set = pa.ParetoArchive().merge(F, X)
 solution_set.to_csv('Pareto.csv')
\ No newline at end of file
@@ -6,58 +6,75 @@ Created on Tue Mar 12 14:34:11 2024
 
 import pandas as pd
 import torch
-import torch.nn as nn
 import surrogate as sr
+import datastore as ds
+import distributed
 from torch.autograd import Variable
-from apollo import mechanics as ma
 from apollo import metrics as me
 
 
-def main(overwrite=False):
+def load_dataset(path='data/miniLUSP_output.csv'):
+    ### Data import, via the columnar cache, and feature-target identification
+    table = ds.load_table(path)
+    df = table.to_frame().dropna()
+    return df, table.features, table.targets, table.xspace, table.yspace
+
+def holdout_split(df, frac=0.8, random_state=42):
+    ### Training sample plus every row it does not contain
+    df_train = df.sample(frac=frac, random_state=random_state)
+    df_test = df.drop(df_train.index)
+    return df_train, df_test
+
+def to_arrays(df, xspace, yspace):
+    dataset = df.to_numpy()
+    X = dataset[:,xspace].reshape(len(dataset), len(xspace)).astype(float)
+    Y = dataset[:,yspace].reshape(len(dataset), len(yspace)).astype(float)
+    return X, Y
+
+
+def main(overwrite=False, processes=1):
     ### Set reproducibility parameters and devices
     torch.manual_seed(42)
     device = torch.device('cuda' if torch.cuda.is_available() else 'cpu')
-    
+
     ### Data import, feature-target identification, and datasplit
-    df = pd.read_csv('data/miniLUSP_output.csv').dropna()
-    columns = df.columns.tolist()
-    features = columns[1:9]
-    targets = columns[9:]
-    xspace = ma.featurelocator(df, features)
-    yspace = ma.featurelocator(df, targets)
-    df_train = df.sample(frac=0.8, random_state=42)
-    
+    df, features, targets, xspace, yspace = load_dataset()
+    df_train, df_test = holdout_split(df)
+
     ### Convert dataframe subsets to arrays and then to PyTorch variables
-    trnset = df_train.to_numpy()
-    fullset = df.to_numpy()
-    X = trnset[:,xspace].reshape(len(trnset), len(xspace)).astype(float)
-    Y = trnset[:,yspace].reshape(len(trnset), len(yspace)).astype(float)
+    X, Y = to_arrays(df_train, xspace, yspace)
     x = Variable(torch.from_numpy(X).to(device))
     y = Variable(torch.from_numpy(Y).to(device))
-    
-    ### Network initialisation
-    net = sr.LandNET(len(xspace), len(yspace))
-    net = nn.DataParallel(net)
-    net.apply(sr.init_weights)
-    
-    ### Network training & evaluation
-    sr.training(net, x, y, device)
-    Z = fullset[:,xspace].reshape(len(fullset), len(xspace)).astype(float)
+
+    ### Network initialisation & training, data-parallel across processes
+    ### on one node if requested, with the same full-batch epochs either way
+    if processes > 1:
+        net, _ = distributed.train(X, Y, processes, epochs=16000,
+                                   batch_size=None, reporting_interval=500)
+        net = net.to(device)
+    else:
+        net = sr.LandNET(len(xspace), len(yspace))
+        net.apply(sr.init_weights)
+        sr.training(net, x, y, device)
+
+    ### Network evaluation
+    Z, _ = to_arrays(df, xspace, yspace)
     z = torch.from_numpy(Z).to(device)
     predicted = net(z.float()).data.cpu().numpy()
     prediction_names = ['GWPR_Predicted', 'Food_Predicted', 'Bird_Predicted']
-    df = pd.concat([df, pd.DataFrame(predicted, columns=prediction_names)], axis=1)
-    df_test = df[~df.isin(df_train)].dropna()
+    df = pd.concat([df, pd.DataFrame(predicted, columns=prediction_names,
+                                     index=df.index)], axis=1)
+    df_test = df.loc[df_test.index]
     r2_string = 'R\N{SUPERSCRIPT TWO}: '
     for xf in (df, df_test):
         print('- - - - - - - - - - - - - - -')
         print(r2_string + str(me.R2(xf[targets[0]], xf['GWPR_Predicted'])))
         print(r2_string + str(me.R2(xf[targets[1]], xf['Food_Predicted'])))
         print(r2_string + str(me.R2(xf[targets[2]], xf['Bird_Predicted'])))
-    
+
     ### Save model
     if overwrite != False:
         torch.save(net, 'model.pt')
 
 if __name__ == "__main__":
-    main(overwrite=True)
\ No newline at end of file
+    main(overwrite=True)
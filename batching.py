@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Micro-batched inference shared by the dashboard's worker threads.
+
+Rather than every callback thread running its own batch-1 forward pass,
+each submits its scenarios to an InferenceExecutor and waits on a future.
+A single inference thread collects whatever arrives within a short window,
+runs one batched forward pass under a fixed intra-op thread budget, and
+hands each caller back its own rows. The executor has a predict method, so
+it can stand in for the network wherever surrogate.predict is used.
+"""
+
+import os
+import time
+import queue
+import threading
+import numpy as np
+import torch
+import surrogate as sr
+import telemetry as tm
+from concurrent.futures import Future
+
+
+class InferenceExecutor:
+    """
+    Collects scenarios submitted from any thread for up to window seconds,
+    or until max_batch rows are pending, and evaluates them together. The
+    window is only waited out after a batch that merged several requests,
+    so a lone user is not held up by it.
+    threads sets torch's intra-op thread count, by default
+    LANDSCAPE_INFERENCE_THREADS or 1.
+    """
+    def __init__(self, model, threads=None, window=0.002, max_batch=4096):
+        if threads is None:
+            threads = int(os.environ.get('LANDSCAPE_INFERENCE_THREADS', 1))
+        self.model = model
+        self.threads = threads
+        self.window = window
+        self.max_batch = max_batch
+        self.batches = 0
+        self.rows = 0
+        self._concurrent = False
+        self._pending = queue.SimpleQueue()
+        self._worker = threading.Thread(target=self._serve, daemon=True,
+                                        name='inference')
+        self._worker.start()
+
+    def submit(self, x):
+        ### A future for the outputs of one scenario or an array of them
+        future = Future()
+        self._pending.put((np.asarray(x, dtype=np.float32), future))
+        return future
+
+    def predict(self, x):
+        return self.submit(x).result()
+
+    def close(self, wait=True):
+        self._pending.put(None)
+        if wait:
+            self._worker.join()
+
+    def _collect(self):
+        ### Block for the first request, then gather more until the window
+        ### closes or the batch is full
+        first = self._pending.get()
+        if first is None:
+            return None
+        requests, rows = [first], len(first[0].reshape(-1, 8))
+        window = self.window if self._concurrent else 0
+        deadline = time.perf_counter() + window
+        while rows < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining > 0:
+                    request = self._pending.get(timeout=remaining)
+                else:
+                    request = self._pending.get_nowait()
+            except queue.Empty:
+                break
+            if request is None:
+                self._pending.put(None)
+                break
+            requests.append(request)
+            rows += len(request[0].reshape(-1, 8))
+        self._concurrent = len(requests) > 1
+        return requests
+
+    def _serve(self):
+        torch.set_num_threads(self.threads)
+        while True:
+            requests = self._collect()
+            if requests is None:
+                return
+            requests = [(x, f) for x, f in requests
+                        if f.set_running_or_notify_cancel()]
+            if not requests:
+                continue
+            X = [x.reshape(-1, 8) for x, _ in requests]
+            try:
+                with tm.forward_seconds.time():
+                    Z = sr.predict(self.model, np.concatenate(X))
+            except Exception as error:
+                for _, future in requests:
+                    future.set_exception(error)
+                continue
+            self.batches += 1
+            self.rows += len(Z)
+            start = 0
+            for (x, future), rows in zip(requests, map(len, X)):
+                z = Z[start:start+rows]
+                future.set_result(z.reshape(-1) if x.ndim == 1 else z)
+                start += rows
+
+
+### Benchmark against per-call inference from many threads
+def latency_benchmark(call, clients=8, requests=200, seed=0):
+    ### Latencies in seconds of batch-1 calls made from concurrent threads
+    latencies = [[] for _ in range(clients)]
+    barrier = threading.Barrier(clients)
+
+    def client(k):
+        rng = np.random.default_rng(seed + k)
+        barrier.wait()
+        for _ in range(requests):
+            x = rng.random(8, dtype=np.float32)
+            start = time.perf_counter()
+            call(x)
+            latencies[k].append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client, args=(k,))
+               for k in range(clients)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return np.concatenate(latencies)
+
+
+if __name__ == "__main__":
+    net = sr.load_model('model.pt')
+    x = np.random.default_rng(1).random((5, 8), dtype=np.float32)
+    executor = InferenceExecutor(net, threads=torch.get_num_threads())
+    assert np.allclose(executor.predict(x), sr.predict(net, x), atol=1e-6)
+    assert executor.predict(x[0]).shape == (3,)
+
+    def per_call(x):
+        with torch.no_grad():
+            return net(torch.from_numpy(x)).numpy()
+
+    print(f'{"clients":>8} {"approach":>12} {"p50 ms":>8} {"p99 ms":>8}')
+    for clients in (1, 4, 16):
+        for name, call in (('per-call', per_call),
+                           ('micro-batch', executor.predict)):
+            latency_benchmark(call, clients, 20)
+            seconds = latency_benchmark(call, clients)
+            p50, p99 = np.percentile(seconds, [50, 99]) * 1e3
+            print(f'{clients:>8} {name:>12} {p50:>8.2f} {p99:>8.2f}')
+    print(f'{executor.rows / executor.batches:.1f} rows per batch on average')
+    executor.close()
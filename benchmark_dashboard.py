@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Headless latency benchmark for the dashboard's slider callbacks.
+
+display_value, enforce_slider_constraints and loadukmap_plotly are called
+directly, without a browser or server, on the 2015 baseline, seeded random
+feasible scenarios and every ambition at its upper bound. For each call the
+median wall time, the peak traced allocation and the number of allocated
+blocks still live afterwards are recorded, together with the size of every
+output serialised as Dash would send it. Results are compared with a stored
+baseline and any metric worse by more than the threshold is reported.
+
+    python benchmark_dashboard.py --save     # record a new baseline
+    python benchmark_dashboard.py            # compare with it
+"""
+
+import sys
+import json
+import time
+import argparse
+import tracemalloc
+import numpy as np
+import torch
+import plotly
+import optimiser as op
+import improvement as im
+import cache as ch
+import dashboard as db
+
+
+baseline_path = 'data/benchmark_baseline.json'
+metrics = ['time_ms', 'peak_kib', 'blocks', 'output_bytes']
+### Absolute changes too small to count, so sub-millisecond calls don't flap
+noise_floor = {'time_ms': 1.0, 'peak_kib': 16, 'blocks': 50, 'output_bytes': 0}
+
+
+def scenarios(n_random=3, seed=42):
+    ### Slider vectors in dashboard order, G, O, P_lo, P_up, S_A, S_P, WL, WP
+    rng = np.random.default_rng(seed)
+    X = torch.as_tensor(rng.random((n_random, 8)) * op.upper_bounds,
+                        dtype=torch.float64)
+    X = im.project(X).numpy()
+    cases = {'zeros': np.zeros(8)}
+    cases.update({f'random_feasible_{i}': x for i, x in enumerate(X)
+                  if im.feasible(x[None])[0]})
+    cases['extreme'] = op.upper_bounds.astype(float)
+    return {name: [round(float(v), 4) for v in x] for name, x in cases.items()}
+
+def callbacks():
+    ### Each benchmarked callable with a function mapping sliders to its args
+    return {'display_value': (db.display_value, lambda x: x),
+            'enforce_slider_constraints': (db.enforce_slider_constraints,
+                                           lambda x: x[:3] + x[4:]),
+            'loadukmap_plotly': (db.loadukmap_plotly,
+                                 lambda x: [db.area_dict] + x)}
+
+
+def output_sizes(result):
+    ### Bytes of each output as serialised in a Dash callback response
+    outputs = result if isinstance(result, (list, tuple)) else [result]
+    return [len(json.dumps(out, cls=plotly.utils.PlotlyJSONEncoder))
+            for out in outputs]
+
+def measure(function, args, repeats=10):
+    function(*args)
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        function(*args)
+        times.append(time.perf_counter() - start)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    tracemalloc.reset_peak()
+    result = function(*args)
+    _, peak = tracemalloc.get_traced_memory()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    blocks = sum(max(stat.count_diff, 0)
+                 for stat in after.compare_to(before, 'lineno'))
+    sizes = output_sizes(result)
+    return {'time_ms': float(np.median(times)) * 1e3,
+            'peak_kib': peak / 1024,
+            'blocks': blocks,
+            'output_bytes': sum(sizes),
+            'bytes_per_output': sizes}
+
+def run(repeats=10):
+    ### Time the work itself, not the artifact cache's hits
+    db.artifacts = ch.ArtifactCache(ch.MemoryBackend(max_items=0))
+    results = {}
+    for name, (function, arguments) in callbacks().items():
+        for case, x in scenarios().items():
+            results[f'{name}/{case}'] = measure(function, arguments(list(x)),
+                                                repeats)
+    return results
+
+
+def compare(results, baseline, threshold=0.2):
+    ### Metrics more than threshold (relatively) worse than the baseline
+    regressions = []
+    for key, result in results.items():
+        if key not in baseline:
+            continue
+        for metric in metrics:
+            old, new = baseline[key][metric], result[metric]
+            if new > old * (1 + threshold) + noise_floor[metric]:
+                regressions.append((key, metric, old, new))
+    return regressions
+
+def report(results, baseline=None):
+    print(f'{"callback/scenario":<46}{"ms":>9}{"peak KiB":>10}'
+          f'{"blocks":>8}{"bytes":>10}')
+    for key, r in results.items():
+        line = (f'{key:<46}{r["time_ms"]:>9.2f}{r["peak_kib"]:>10.0f}'
+                f'{r["blocks"]:>8d}{r["output_bytes"]:>10d}')
+        if baseline and key in baseline:
+            change = r['time_ms'] / baseline[key]['time_ms'] - 1
+            line += f'  ({change:+.0%} time)'
+        print(line)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Benchmark the dashboard callbacks against a baseline.')
+    parser.add_argument('--baseline', default=baseline_path)
+    parser.add_argument('--save', action='store_true',
+                        help='store these results as the new baseline')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='relative slow-down counted as a regression')
+    parser.add_argument('--repeats', type=int, default=10)
+    args = parser.parse_args(argv)
+    results = run(args.repeats)
+    if args.save:
+        with open(args.baseline, 'w') as f:
+            json.dump(results, f, indent=1)
+        report(results)
+        return 0
+    try:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    except FileNotFoundError:
+        baseline = {}
+        print(f'No baseline at {args.baseline}, run with --save to create one')
+    report(results, baseline)
+    regressions = compare(results, baseline, args.threshold)
+    for key, metric, old, new in regressions:
+        print(f'REGRESSION {key} {metric}: {old:.1f} -> {new:.1f}')
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cache of the dashboard's predictions and rendered figures.
+
+Artifacts are stored under keys made from their kind, the hash of the
+surrogate that produced them and the inputs they depend on, so a new
+model.pt never serves stale results. The backend is chosen with
+LANDSCAPE_CACHE:
+
+    memory            per-process LRU of LANDSCAPE_CACHE_ITEMS entries (default)
+    disk              diskcache (SQLite) under data/.cache/artifacts, shared by
+                      every worker process on the host, least-recently-used
+                      eviction beyond LANDSCAPE_CACHE_MB
+    redis://host:port a Redis-compatible server shared across hosts, which
+                      evicts by its own maxmemory-policy (allkeys-lru);
+                      needs the redis package
+
+Lookups are counted in telemetry's landscape_cache_requests_total.
+"""
+
+import os
+import pickle
+import hashlib
+import threading
+from collections import OrderedDict
+import datastore as ds
+import telemetry as tm
+
+
+class MemoryBackend:
+    ### Thread-safe LRU of at most max_items objects, kept unpickled
+    def __init__(self, max_items=256):
+        self.max_items = max_items
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            if key not in self._items:
+                return None
+            self._items.move_to_end(key)
+            return self._items[key]
+
+    def set(self, key, value):
+        with self._lock:
+            self._items[key] = value
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_items:
+                self._items.popitem(last=False)
+
+class DiskBackend:
+    ### diskcache on SQLite, shared between processes, LRU beyond size_limit
+    def __init__(self, directory=os.path.join(ds.cache_root, 'artifacts'),
+                 size_limit=512 * 2**20):
+        import diskcache
+        self._cache = diskcache.Cache(
+            directory, size_limit=size_limit,
+            eviction_policy='least-recently-used')
+
+    def get(self, key):
+        return self._cache.get(key)
+
+    def set(self, key, value):
+        self._cache.set(key, value)
+
+class RedisBackend:
+    ### Any Redis-compatible server; eviction is left to its maxmemory-policy
+    def __init__(self, url='redis://localhost:6379/0', ttl=None):
+        try:
+            import redis
+        except ImportError as error:
+            raise ImportError('LANDSCAPE_CACHE=redis://... needs the redis '
+                              'package (pip install redis)') from error
+        self._client = redis.Redis.from_url(url)
+        self.ttl = ttl
+
+    def get(self, key):
+        value = self._client.get(key)
+        return None if value is None else pickle.loads(value)
+
+    def set(self, key, value):
+        self._client.set(key, pickle.dumps(value, pickle.HIGHEST_PROTOCOL),
+                         ex=self.ttl)
+
+
+class ArtifactCache:
+    def __init__(self, backend=None, model_path='model.pt'):
+        self.backend = backend or MemoryBackend()
+        self.model_path = model_path
+        self._version = None
+
+    @property
+    def version(self):
+        ### Short hash of the surrogate, read once per process
+        if self._version is None:
+            self._version = ds.file_hash(self.model_path)[:16]
+        return self._version
+
+    def key(self, kind, *parts, version=None):
+        digest = hashlib.sha1(repr(parts).encode()).hexdigest()
+        return f'landscape:{kind}:{version or self.version}:{digest}'
+
+    def get_or_compute(self, kind, parts, compute, version=None):
+        """
+        The cached artifact of this kind for these inputs, computing and
+        storing it on a miss. parts must have a stable repr, e.g. rounded
+        floats, strings and tuples. version overrides the hash of
+        model_path, e.g. for another model from the registry.
+        """
+        key = self.key(kind, *parts, version=version)
+        value = self.backend.get(key)
+        if value is not None:
+            tm.cache_requests.inc(1, kind, 'hit')
+            return value
+        tm.cache_requests.inc(1, kind, 'miss')
+        value = compute()
+        self.backend.set(key, value)
+        return value
+
+
+def from_environment():
+    setting = os.environ.get('LANDSCAPE_CACHE', 'memory')
+    if setting == 'memory':
+        backend = MemoryBackend(int(os.environ.get('LANDSCAPE_CACHE_ITEMS', 256)))
+    elif setting == 'disk':
+        backend = DiskBackend(
+            size_limit=int(os.environ.get('LANDSCAPE_CACHE_MB', 512)) * 2**20)
+    elif setting.startswith(('redis://', 'rediss://', 'unix://')):
+        backend = RedisBackend(setting)
+    else:
+        raise ValueError(f'Unknown LANDSCAPE_CACHE {setting}, expected '
+                         'memory, disk or a redis:// URL')
+    return ArtifactCache(backend)
+
+def rounded(values, digits=4):
+    ### Slider values as a hashable key, at the sliders' 0.0001 step
+    return tuple(round(float(v), digits) for v in values)
@@ -33,5 +33,10 @@ constraints, optimising_constraints = split_constraints([
   , (var("G") + var("O") <= 1)
   ])
 
+# Model variables in the order of the ambition_* columns, and the
+# constraints compiled to matrix form over them, i.e. X @ A.T <= b
+variables = ["G", "O", "P_lo", "P_up", "S_A", "S_P", "WL", "WP"]
+constraint_matrix, constraint_bounds = compile_constraints(constraints, variables)
+
 # Uncomment me to generate LaTeX specification document when running the dashboard
 # generateLatexSpecification(constraints)
\ No newline at end of file
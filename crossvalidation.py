@@ -0,0 +1,136 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parallel k-fold cross-validation of the LandNET surrogate.
+
+The feature and target arrays are placed in shared memory once, and each
+fold is trained in its own worker process against zero-copy views of them,
+so only the fold indices are sent between processes. Per-fold and aggregate
+R² and RMSE for every target are written as CSV or JSON.
+"""
+
+import os
+import numpy as np
+import pandas as pd
+import torch
+import surrogate as sr
+import annmodel as am
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from concurrent.futures import ProcessPoolExecutor
+from apollo import metrics as me
+
+
+def fold_indices(n_rows, k=5, random_state=42):
+    order = np.random.default_rng(random_state).permutation(n_rows)
+    return np.array_split(order, k)
+
+
+class SharedArray:
+    """
+    A NumPy array backed by a named shared memory block, which can be
+    pickled cheaply and re-attached in another process without copying.
+    """
+    def __init__(self, shape, dtype, name=None):
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        size = max(1, int(np.prod(self.shape)) * self.dtype.itemsize)
+        self.owner = name is None
+        self.block = shared_memory.SharedMemory(name=name, create=self.owner,
+                                                size=size)
+        self.array = np.ndarray(self.shape, self.dtype, buffer=self.block.buf)
+
+    @classmethod
+    def copy_of(cls, array):
+        shared = cls(array.shape, array.dtype)
+        shared.array[:] = array
+        return shared
+
+    def __reduce__(self):
+        return (SharedArray, (self.shape, self.dtype.str, self.block.name))
+
+    def close(self):
+        self.array = None
+        self.block.close()
+
+    def release(self):
+        self.close()
+        if self.owner:
+            self.block.unlink()
+
+
+def _train_fold(X, Y, test_idx, epochs, threads, seed=42):
+    """
+    Train a fresh network on every row outside the test fold and score it
+    on the fold, returning R² and RMSE for each target.
+    """
+    torch.set_num_threads(threads)
+    torch.manual_seed(seed)
+    train = np.ones(len(X.array), dtype=bool)
+    train[test_idx] = False
+    x = torch.from_numpy(X.array[train])
+    y = torch.from_numpy(Y.array[train])
+    net = sr.LandNET(x.shape[1], y.shape[1])
+    net.apply(sr.init_weights)
+    sr.training(net, x, y, torch.device('cpu'), epochs=epochs,
+                reporting_interval=None)
+    with torch.no_grad():
+        predicted = net(torch.from_numpy(X.array[test_idx]).float()).numpy()
+    observed = Y.array[test_idx]
+    scores = [(float(me.R2(observed[:,i], predicted[:,i])),
+               float(np.sqrt(np.mean((observed[:,i] - predicted[:,i])**2))))
+              for i in range(observed.shape[1])]
+    X.close()
+    Y.close()
+    return scores
+
+
+def summarise(scores, targets, fold_sizes):
+    rows = []
+    for fold, (fold_scores, n_test) in enumerate(zip(scores, fold_sizes)):
+        for target, (r2, rmse) in zip(targets, fold_scores):
+            rows.append({'fold': str(fold), 'target': target, 'n_test': n_test,
+                         'r2': r2, 'rmse': rmse})
+    table = pd.DataFrame(rows)
+    folds = table.groupby('target', sort=False)[['r2', 'rmse']]
+    for name, agg in (('mean', folds.mean()), ('std', folds.std(ddof=1))):
+        agg = agg.reset_index()
+        agg.insert(0, 'fold', name)
+        agg.insert(2, 'n_test', int(sum(fold_sizes)))
+        table = pd.concat([table, agg], ignore_index=True)
+    return table
+
+
+def cross_validate(k=5, epochs=16000, n_workers=None, threads_per_worker=1,
+                   path='data/miniLUSP_output.csv', random_state=42):
+    df, features, targets, xspace, yspace = am.load_dataset(path)
+    X, Y = am.to_arrays(df, xspace, yspace)
+    folds = fold_indices(len(X), k, random_state)
+    if n_workers is None:
+        n_workers = min(k, max(1, (os.cpu_count() or 1) // threads_per_worker))
+    shared_X, shared_Y = SharedArray.copy_of(X), SharedArray.copy_of(Y)
+    try:
+        with ProcessPoolExecutor(max_workers=n_workers,
+                                 mp_context=mp.get_context('spawn')) as pool:
+            jobs = [pool.submit(_train_fold, shared_X, shared_Y, test_idx,
+                                epochs, threads_per_worker)
+                    for test_idx in folds]
+            scores = [job.result() for job in jobs]
+    finally:
+        shared_X.release()
+        shared_Y.release()
+    return summarise(scores, targets, [len(f) for f in folds])
+
+
+def main(output='data/CrossValidation.csv', k=5, epochs=16000,
+         n_workers=None, threads_per_worker=1):
+    table = cross_validate(k, epochs, n_workers, threads_per_worker)
+    print(table[table.fold.isin(['mean', 'std'])].to_string(index=False))
+    if output.endswith('.json'):
+        table.to_json(output, orient='records', indent=1)
+    else:
+        table.to_csv(output, index=False)
+    return table
+
+if __name__ == "__main__":
+    main()
@@ -4,45 +4,37 @@ Created on Tue Apr 21 16:38:52 2024
 @author: robertrouse
 """
 
+import os
 import pandas as pd
 import numpy as np
 import dash
-import torch
+import diskcache
 import random
-import surrogate as sr
+import datastore as ds
+import evaluate as ev
+import resources as rs
+import cache as ch
+import telemetry as tm
+import profiling
 import visualisation as vi
-from torch.autograd import Variable
-from apollo import mechanics as ma
-from dash import Dash, dcc, html, Input, Output, callback
+from dash import Dash, DiskcacheManager, dcc, html, Input, Output, State, callback
 import dash_bootstrap_components as dbc
-from plotly.subplots import make_subplots
-import plotly.express as px
 import plotly.graph_objects as go
 
+### torch, the surrogate, geopandas and the Pareto front load on first use
+### (see resources.py); modules only callbacks need are imported in them
 
-# Set non-interactive backend to avoid threading issues
-import matplotlib
-
-matplotlib.use("Agg")
-import geopandas as gpd
+# Set non-interactive backend to avoid threading issues, should anything
+# imported later use matplotlib
+os.environ.setdefault("MPLBACKEND", "Agg")
 
 # Constraints for the model are defined here
 from constraints import constraints, Constraint
 
-### Set plotting style parameters
-ma.textstyle()
-
 random.seed(42)
 
-### Set global model parameters
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-
-pareto = pd.read_csv("data/Pareto_5000.csv")
-
-
-### Network Loading
-net = torch.load("model.pt", weights_only=False)
-net.eval()
+### Predictions and figures, per process or shared as set by LANDSCAPE_CACHE
+artifacts = ch.from_environment()
 
 area_dict = {
     "grassland": [11639928.2227896, 0.470769699212438],
@@ -57,6 +49,47 @@ area_dict = {
     "not_used": [9999759.5395, 0.404434091044499],
 }
 
+slider_ids = [
+    "grassland",
+    "organic",
+    "peatland_lo",
+    "peatland_up",
+    "silvoa",
+    "silvop",
+    "woodland",
+    "woodpa",
+]
+
+slider_labels = [
+    "Grassland",
+    "Organic",
+    "Peatland (Lowland)",
+    "Peatland (Upland)",
+    "Silvoarable",
+    "Silvopastoral",
+    "Woodland",
+    "Wood Pasture",
+]
+
+weight_scale = {0: "0.0", 0.5: "0.5", 1.0: "1.0"}
+
+### Pareto scatters by graph: x, y and colour columns, and colour limits
+pareto_axes = {
+    "fig4": ("gwp_rel", "food_rel", "birds_rel", [0.9, 1.2]),
+    "fig5": ("birds_rel", "food_rel", "gwp_rel", [-1, 1]),
+    "fig6": ("birds_rel", "gwp_rel", "food_rel", [-1, 1]),
+}
+
+### Largest optimisation a user can start, read from the same variables as
+### the limits jobs.py enforces on the server
+job_limits = {
+    "population": (10, int(os.environ.get("LANDSCAPE_JOB_MAX_POPULATION", 2000))),
+    "generations": (2, int(os.environ.get("LANDSCAPE_JOB_MAX_GENERATIONS", 500))),
+}
+
+### Most front points drawn per scatter, in the full view or zoomed in
+point_budget = int(os.environ.get("LANDSCAPE_POINT_BUDGET", 5000))
+
 slider_scale = {
     0: "0.0",
     0.1: "0.1",
@@ -71,10 +104,51 @@ slider_scale = {
     1.0: "1.0",
 }
 
-app = Dash(external_stylesheets=[dbc.themes.BOOTSTRAP])
+### Re-optimisation jobs run in background processes managed on disk
+background_manager = DiskcacheManager(
+    diskcache.Cache(os.path.join(ds.cache_root, "jobs"))
+)
+
+app = Dash(
+    external_stylesheets=[dbc.themes.BOOTSTRAP],
+    background_callback_manager=background_manager,
+)
+### Bulk scenario scoring at POST /api/evaluate
+ev.register(app.server, lambda: rs.registry().get().net)
+### WSGI entry point, e.g. gunicorn dashboard:server
+server = app.server
+### Prometheus metrics at /metrics and timing of every callback
+tm.register(app)
+### Sampled callback profiles if LANDSCAPE_PROFILE_EVERY is set
+profiling.register(app)
+### Record callback requests as load-test traces if LANDSCAPE_RECORD_TRACE is set
+if os.environ.get("LANDSCAPE_RECORD_TRACE"):
+    import loadtest as lt
+
+    lt.record_traces(server, os.environ["LANDSCAPE_RECORD_TRACE"])
 app.layout = html.Div(
     [
         html.Img(className="banner", src="assets/Banner_cropped.png"),
+        ### Surrogate for this browser session, from models.json
+        dbc.Row(
+            [
+                dbc.Col(
+                    [
+                        html.Label("Surrogate model", className="slider_label"),
+                        dcc.Dropdown(
+                            options=rs.registry().options(),
+                            value=rs.registry().default,
+                            clearable=False,
+                            persistence=True,
+                            persistence_type="session",
+                            id="model-id",
+                        ),
+                    ],
+                    width={"size": 4},
+                ),
+                dbc.Col(html.Div(id="model-status"), width={"size": 8}),
+            ]
+        ),
         dbc.Row(
             [
                 dbc.Col(
@@ -98,6 +172,11 @@ app.layout = html.Div(
                                 updatemode="drag",
                                 id="grassland",
                             ),
+                            dcc.Graph(
+                                id="curve-grassland",
+                                config={"displayModeBar": False},
+                                style={"height": "60px"},
+                            ),
                             html.Label(
                                 "Organic & Regenerative Farmland",
                                 className="slider_label",
@@ -115,6 +194,11 @@ app.layout = html.Div(
                                 updatemode="drag",
                                 id="organic",
                             ),
+                            dcc.Graph(
+                                id="curve-organic",
+                                config={"displayModeBar": False},
+                                style={"height": "60px"},
+                            ),
                             html.Label(
                                 "Peatland (Lowland)", className="slider_label"
                             ),
@@ -131,6 +215,11 @@ app.layout = html.Div(
                                 updatemode="drag",
                                 id="peatland_lo",
                             ),
+                            dcc.Graph(
+                                id="curve-peatland_lo",
+                                config={"displayModeBar": False},
+                                style={"height": "60px"},
+                            ),
                             html.Label(
                                 "Peatland (Upland)", className="slider_label"
                             ),
@@ -147,6 +236,11 @@ app.layout = html.Div(
                                 updatemode="drag",
                                 id="peatland_up",
                             ),
+                            dcc.Graph(
+                                id="curve-peatland_up",
+                                config={"displayModeBar": False},
+                                style={"height": "60px"},
+                            ),
                             html.Label(
                                 "Silvoarable (Mixed Crop Farming with Trees)",
                                 className="slider_label",
@@ -164,6 +258,11 @@ app.layout = html.Div(
                                 updatemode="drag",
                                 id="silvoa",
                             ),
+                            dcc.Graph(
+                                id="curve-silvoa",
+                                config={"displayModeBar": False},
+                                style={"height": "60px"},
+                            ),
                             html.Label(
                                 "Silvopastoral (Mixed Livestock Grazing with Trees)",
                                 className="slider_label",
@@ -181,6 +280,11 @@ app.layout = html.Div(
                                 updatemode="drag",
                                 id="silvop",
                             ),
+                            dcc.Graph(
+                                id="curve-silvop",
+                                config={"displayModeBar": False},
+                                style={"height": "60px"},
+                            ),
                             html.Label("Woodland", className="slider_label"),
                             dcc.Slider(
                                 min=0,
@@ -195,6 +299,11 @@ app.layout = html.Div(
                                 updatemode="drag",
                                 id="woodland",
                             ),
+                            dcc.Graph(
+                                id="curve-woodland",
+                                config={"displayModeBar": False},
+                                style={"height": "60px"},
+                            ),
                             html.Label(
                                 "Wood Pasture", className="slider_label"
                             ),
@@ -211,6 +320,11 @@ app.layout = html.Div(
                                 updatemode="drag",
                                 id="woodpa",
                             ),
+                            dcc.Graph(
+                                id="curve-woodpa",
+                                config={"displayModeBar": False},
+                                style={"height": "60px"},
+                            ),
                         ]
                     ),
                     width={"size": 4},
@@ -342,13 +456,43 @@ app.layout = html.Div(
                     width={"size": 4},
                 ),
             ],
-            # dbc.Row([
-            #     dbc.Col([
-            #         html.Div(children=[
-            #                    html.H1(id='score_text'),
-            #                ]),
-            #         ]),
-            #     ])
+        ),
+        dbc.Row(
+            [
+                dbc.Col(
+                    [
+                        html.Div(
+                            children=[
+                                html.H3(
+                                    id="score_text", className="graph_heading"
+                                ),
+                            ]
+                        ),
+                    ],
+                    width={"size": 8},
+                ),
+                dbc.Col(
+                    [
+                        html.Label(
+                            "Closest Pareto-optimal scenario by",
+                            className="slider_label",
+                        ),
+                        dcc.RadioItems(
+                            options=[
+                                {"label": "Outcomes", "value": "objective"},
+                                {"label": "Land use", "value": "decision"},
+                            ],
+                            value="objective",
+                            inline=True,
+                            id="nearest-space",
+                        ),
+                        html.Button("Snap to Front", id="snap", n_clicks=0),
+                        html.Div(id="snap-status"),
+                        dcc.Store(id="snap-candidates"),
+                    ],
+                    width={"size": 4},
+                ),
+            ]
         ),
         dbc.Row(
             [
@@ -369,6 +513,127 @@ app.layout = html.Div(
                 ),
             ]
         ),
+        dbc.Row(
+            [
+                dbc.Col(
+                    [
+                        html.H3(
+                            ["Preferred Pareto-Optimal Scenario"],
+                            className="graph_heading",
+                        ),
+                        html.Label(
+                            "Weight on Net CO2e Emissions",
+                            className="slider_label",
+                        ),
+                        dcc.Slider(
+                            min=0,
+                            max=1,
+                            step=0.05,
+                            marks=weight_scale,
+                            value=0.5,
+                            id="weight-gwp",
+                        ),
+                        html.Label(
+                            "Weight on Agricultural Output",
+                            className="slider_label",
+                        ),
+                        dcc.Slider(
+                            min=0,
+                            max=1,
+                            step=0.05,
+                            marks=weight_scale,
+                            value=0.5,
+                            id="weight-food",
+                        ),
+                        html.Label(
+                            "Weight on Bird Species Population",
+                            className="slider_label",
+                        ),
+                        dcc.Slider(
+                            min=0,
+                            max=1,
+                            step=0.05,
+                            marks=weight_scale,
+                            value=0.5,
+                            id="weight-birds",
+                        ),
+                    ],
+                    width={"size": 4},
+                ),
+                dbc.Col(
+                    [
+                        html.Label(
+                            "Largest Net CO2e Emissions (relative)",
+                            className="slider_label",
+                        ),
+                        dcc.Input(id="threshold-gwp", type="number", step=0.01),
+                        html.Label(
+                            "Smallest Agricultural Output (relative)",
+                            className="slider_label",
+                        ),
+                        dcc.Input(id="threshold-food", type="number", step=0.01),
+                        html.Label(
+                            "Smallest Bird Species Population (relative)",
+                            className="slider_label",
+                        ),
+                        dcc.Input(id="threshold-birds", type="number", step=0.01),
+                        html.Br(),
+                        html.Button(
+                            "Apply Preferences", id="pick-pareto", n_clicks=0
+                        ),
+                        html.Div(id="pick-status"),
+                    ],
+                    width={"size": 4},
+                ),
+                dbc.Col(
+                    [
+                        html.H3(
+                            ["Re-optimise with Pinned Land Use"],
+                            className="graph_heading",
+                        ),
+                        dcc.Checklist(
+                            options=[
+                                {"label": label, "value": i}
+                                for i, label in enumerate(slider_labels)
+                            ],
+                            value=[],
+                            inline=True,
+                            id="pinned",
+                        ),
+                        html.Label("Population", className="slider_label"),
+                        dcc.Input(
+                            id="job-population",
+                            type="number",
+                            value=200,
+                            min=job_limits["population"][0],
+                            max=job_limits["population"][1],
+                        ),
+                        html.Label("Generations", className="slider_label"),
+                        dcc.Input(
+                            id="job-generations",
+                            type="number",
+                            value=100,
+                            min=job_limits["generations"][0],
+                            max=job_limits["generations"][1],
+                        ),
+                        html.Br(),
+                        html.Button("Optimise", id="run-job", n_clicks=0),
+                        html.Button(
+                            "Cancel", id="cancel-job", n_clicks=0, disabled=True
+                        ),
+                        html.Button(
+                            "Show Stored Front", id="reset-front", n_clicks=0
+                        ),
+                        html.Br(),
+                        html.Progress(id="job-progress", value="0", max="100"),
+                        html.Div(id="job-progress-text"),
+                        html.Div(id="job-status"),
+                        dcc.Store(id="optimised-front"),
+                    ],
+                    width={"size": 4},
+                ),
+            ]
+        ),
     ],
     style={"margin-left": "80px", "margin-top": "0px", "margin-right": "80px"},
 )
@@ -383,6 +648,7 @@ app.layout = html.Div(
     Output("fig4", "figure"),
     Output("fig5", "figure"),
     Output("fig6", "figure"),
+    Output("score_text", "children"),
     Input("grassland", "value"),
     Input("organic", "value"),
     Input("peatland_lo", "value"),
@@ -391,22 +657,11 @@ app.layout = html.Div(
     Input("silvop", "value"),
     Input("woodland", "value"),
     Input("woodpa", "value"),
+    Input("nearest-space", "value"),
+    Input("optimised-front", "data"),
+    Input("snap-candidates", "data"),
+    Input("model-id", "value"),
 )
-
-
-# def euclid_distance(candidates, target):
-#     distances = np.linalg.norm(candidates - target, axis=1)
-#     closest_idx = np.argmin(distances)
-#     return closest_idx, distances[closest_idx]
-
-# def scoring(base_dist, new_dist):
-#     if new_dist>base_dist:
-#         score = 0
-#     else:
-#         score = 100 * (1 - (base_dist/new_dist))
-#     return score
-
-
 def display_value(
     grassland,
     organic,
@@ -416,11 +671,22 @@ def display_value(
     silvop,
     woodland,
     woodpa,
-    pareto=pareto,
+    space="objective",
+    front_key=None,
+    snap=None,
+    model_id=None,
+    pareto=None,
 ):
-    base = np.zeros((8,))
-    base = torch.from_numpy(base)
-    base = net(base.float()).data.numpy()
+    import decision as dc
+
+    model = rs.registry().get(model_id)
+    base = np.zeros((8,), dtype=np.float32)
+    base = artifacts.get_or_compute(
+        "prediction",
+        (ch.rounded(base),),
+        lambda: model.executor.predict(base),
+        model.version,
+    )
     z = np.array(
         [
             grassland,
@@ -431,12 +697,42 @@ def display_value(
             silvop,
             woodland,
             woodpa,
-        ]
+        ],
+        dtype=np.float32,
+    )
+    x = z.astype(float)
+    key = ch.rounded(x)
+    z = artifacts.get_or_compute(
+        "prediction",
+        (key,),
+        lambda: model.executor.predict(x.astype(np.float32)),
+        model.version,
     )
-    z = torch.from_numpy(z)
-    z = net(z.float()).data.numpy()
     col_list = ["gwp_rel", "food_rel", "birds_rel"]
     zf = pd.DataFrame(z.reshape(1, -1), columns=col_list)
+
+    front, shown = shown_front(model, front_key)
+    if pareto is None or front is not model.picker:
+        pareto = shown
+
+    ### Closest Pareto-optimal alternatives to the scenario and to 2015
+    if space == "decision":
+        i, new_dist = front.nearest(x, space)
+        _, base_dist = front.nearest(np.zeros(8), space)
+    else:
+        i, new_dist = front.nearest(z, space)
+        _, base_dist = front.nearest(base, space)
+    nearest = pd.DataFrame(front.Z[i].reshape(1, -1), columns=col_list)
+    score = dc.improvement_score(base_dist, new_dist)
+    score_text = (
+        "Closer to the Pareto front than 2015 by {:.1f}% "
+        "(nearest Pareto-optimal alternative marked \u25c7)".format(score)
+    )
+
+    ### Dominating candidates from "snap to front", if still current
+    candidates = pd.DataFrame(columns=col_list)
+    if snap and np.allclose(snap["x"], x, atol=1e-6):
+        candidates = pd.DataFrame(snap["Z"], columns=col_list)
     fig1 = vi.single_dumbell(
         "Net CO2e emissions % change",
         base[0],
@@ -538,46 +834,14 @@ def display_value(
     )
     fig3.layout.font.family = "Arial Black"
 
-    fig4 = vi.dashboard_pareto_scatter(
-        "Text",
-        pareto["gwp_rel"],
-        pareto["food_rel"],
-        pareto["birds_rel"],
-        zf["gwp_rel"],
-        zf["food_rel"],
-        [0.9, 1.2],
-        ["#8B424B", "#CCA857", "#7DB567"],
+    ### Pareto scatters for this front, scenario, alternative and candidates
+    fig4, fig5, fig6 = artifacts.get_or_compute(
+        "pareto-figures",
+        (front_key, key, int(i), ch.rounded(candidates.to_numpy().ravel(), 6)),
+        lambda: pareto_figures(pareto, zf, nearest, candidates),
+        model.version,
     )
-    fig4.update_layout(plot_bgcolor="white")
-    fig5 = vi.dashboard_pareto_scatter(
-        "Text",
-        pareto["birds_rel"],
-        pareto["food_rel"],
-        pareto["gwp_rel"],
-        zf["birds_rel"],
-        zf["food_rel"],
-        [-1, 1],
-        ["#8B424B", "#CCA857", "#7DB567"],
-    )
-    fig5.update_layout(plot_bgcolor="white")
-    fig6 = vi.dashboard_pareto_scatter(
-        "Text",
-        pareto["birds_rel"],
-        pareto["gwp_rel"],
-        pareto["food_rel"],
-        zf["birds_rel"],
-        zf["gwp_rel"],
-        [-1, 1],
-        ["#8B424B", "#CCA857", "#7DB567"],
-    )
-    fig6.update_layout(plot_bgcolor="white")
 
-    # pareto_arr = pareto[['gwp_rel','food_rel', 'birds_rel']].to_numpy()
-    # _, base_dist = euclid_distance(pareto_arr, base)
-    # _, new_dist = euclid_distance(pareto_arr, z)
-    # score = scoring(base_dist, new_dist)
-    # score_text = 'Relative geometric change across 120 terrestrial \
-    #         bird species populations : {}'.format(score)
     # fig = px.scatter(x=data_x, y=data_y, trendline="ols",
     #               trendline_color_override="black",)
 
@@ -586,19 +850,93 @@ def display_value(
     #                           colorbar_x=-0.3),
     #              )
 
-    uk_map = loadukmap_plotly(
-        area_dict,
-        grassland,
-        organic,
-        peatland_lo,
-        peatland_up,
-        silvoa,
-        silvop,
-        woodland,
-        woodpa,
+    uk_map = artifacts.get_or_compute(
+        "map", (key,), lambda: loadukmap_plotly(area_dict, *key)
     )
 
-    return [fig1, fig2, fig3, uk_map, fig4, fig5, fig6]
+    return [fig1, fig2, fig3, uk_map, fig4, fig5, fig6, score_text]
+
+
+def shown_front(model, front_key=None):
+    """The re-optimised front if one is shown, else the model's Pareto set"""
+    front = None
+    if front_key:
+        import jobs
+
+        front = jobs.load_front(front_key)
+    if front is None:
+        return model.picker, model.pareto
+    return front, pd.DataFrame(
+        front.Z, columns=["gwp_rel", "food_rel", "birds_rel"]
+    )
+
+
+def pareto_figures(pareto, zf, nearest, candidates):
+    """Pareto front scatters with the scenario, alternative and candidates"""
+    figures = []
+    for x, y, colour, limits in pareto_axes.values():
+        fig = vi.dashboard_pareto_scattergl(
+            "Text",
+            pareto[x],
+            pareto[y],
+            pareto[colour],
+            zf[x],
+            zf[y],
+            limits,
+            ["#8B424B", "#CCA857", "#7DB567"],
+            highlight_x=nearest[x],
+            highlight_y=nearest[y],
+            candidate_x=candidates[x],
+            candidate_y=candidates[y],
+            budget=point_budget,
+        )
+        fig.update_layout(plot_bgcolor="white")
+        figures.append(fig)
+    return tuple(figures)
+
+
+def view_range(relayout, axis):
+    """
+    The range of an axis from a graph's relayoutData: (low, high) after a
+    zoom or pan, None after autoscaling, or False if it did not change.
+    """
+    if relayout.get(axis + ".autorange"):
+        return None
+    if axis + ".range[0]" in relayout:
+        return relayout[axis + ".range[0]"], relayout[axis + ".range[1]"]
+    if axis + ".range" in relayout:
+        return tuple(relayout[axis + ".range"])
+    return False
+
+
+# Redraw the front within a zoomed Pareto scatter at the full point budget
+@app.callback(
+    [Output(graph, "figure", allow_duplicate=True) for graph in pareto_axes],
+    [Input(graph, "relayoutData") for graph in pareto_axes],
+    State("model-id", "value"),
+    State("optimised-front", "data"),
+    prevent_initial_call=True,
+)
+def refine_pareto_view(*values):
+    model_id, front_key = values[-2:]
+    graph = dash.ctx.triggered_id
+    relayout = values[list(pareto_axes).index(graph)] or {}
+    x_range = view_range(relayout, "xaxis")
+    y_range = view_range(relayout, "yaxis")
+    if x_range is False and y_range is False:
+        raise dash.exceptions.PreventUpdate
+    _, pareto = shown_front(rs.registry().get(model_id), front_key)
+    x, y, colour, _ = pareto_axes[graph]
+    patch = vi.refine_pareto_trace(
+        dash.Patch(),
+        pareto[x],
+        pareto[y],
+        pareto[colour],
+        point_budget,
+        x_range or None,
+        y_range or None,
+    )
+    return [patch if g == graph else dash.no_update for g in pareto_axes]
 
 
 # Enforce invariants on the sliders
@@ -636,11 +974,14 @@ def enforce_slider_constraints(g_val, o_val, p_lo, s_a, s_p, w_l, w_p):
         "WP": w_p,
     }
     # Apply balancing of the constraints when constraints are not satisfied
+    balanced = 0
     for constraint in constraints:
         if isinstance(constraint, Constraint) and not constraint.isSatisfied(
             model
         ):
             model = constraint.balance(model)
+            balanced += 1
+    tm.enforcement_iterations.observe(balanced)
 
     # Return the balanced values back to the UI
     return (
@@ -654,6 +995,196 @@ def enforce_slider_constraints(g_val, o_val, p_lo, s_a, s_p, w_l, w_p):
     )
 
 
+# Move the sliders to the preferred Pareto-optimal scenario
+@app.callback(
+    [Output(slider, "value", allow_duplicate=True) for slider in slider_ids]
+    + [Output("pick-status", "children")],
+    Input("pick-pareto", "n_clicks"),
+    State("weight-gwp", "value"),
+    State("weight-food", "value"),
+    State("weight-birds", "value"),
+    State("threshold-gwp", "value"),
+    State("threshold-food", "value"),
+    State("threshold-birds", "value"),
+    State("optimised-front", "data"),
+    State("model-id", "value"),
+    prevent_initial_call=True,
+)
+def pick_pareto_scenario(
+    n_clicks,
+    w_gwp,
+    w_food,
+    w_birds,
+    gwp_max,
+    food_min,
+    birds_min,
+    front_key,
+    model_id=None,
+):
+    import jobs
+
+    front = jobs.load_front(front_key) if front_key else None
+    if front is None:
+        front = rs.registry().get(model_id).picker
+    i = front.pick([w_gwp, w_food, w_birds], gwp_max, food_min, birds_min)
+    if i is None:
+        return [dash.no_update] * len(slider_ids) + [
+            "No Pareto-optimal scenario meets these thresholds"
+        ]
+    gwp, food, birds = front.Z[i]
+    status = "Net CO2e {:.3f}, agricultural output {:.3f}, birds {:.3f}".format(
+        gwp, food, birds
+    )
+    return [float(v) for v in front.X[i]] + [status]
+
+
+# What-if curves under each slider, from one batched network call
+@app.callback(
+    [Output("curve-" + slider, "figure") for slider in slider_ids],
+    [Input(slider, "value") for slider in slider_ids],
+    Input("model-id", "value"),
+)
+def response_curves(*values):
+    import sensitivity as se
+
+    ambitions, model_id = values[: len(slider_ids)], values[len(slider_ids)]
+    executor = rs.registry().get(model_id).executor
+    levels, curves, feasible = se.response_curves(executor, ambitions)
+    reference = executor.predict(np.array(ambitions, dtype=np.float32))
+    return [
+        vi.response_sparkline(levels, curves[k], feasible[k], ambitions[k], reference)
+        for k in range(len(slider_ids))
+    ]
+
+
+# Dominating scenarios near the current one, by projected gradients
+@app.callback(
+    Output("snap-candidates", "data"),
+    Output("snap-status", "children"),
+    Input("snap", "n_clicks"),
+    *[State(slider, "value") for slider in slider_ids],
+    State("model-id", "value"),
+    prevent_initial_call=True,
+)
+def snap_to_front(n_clicks, *values):
+    import improvement as im
+
+    ambitions, model_id = values[: len(slider_ids)], values[len(slider_ids)]
+    model = rs.registry().get(model_id)
+    x = np.array(ambitions, dtype=np.float32).astype(float)
+    X, Z = im.snap_to_front(model.grad_net, x, scale=model.picker.span)
+    ### Sliders can leave the land-use constraints, which candidates keep to
+    infeasible = ""
+    if not im.feasible(x[None])[0]:
+        infeasible = "This scenario breaks the land-use constraints. "
+    if not len(X):
+        return None, infeasible + "No nearby feasible scenario improves on it"
+    return {"x": x.tolist(), "X": X.tolist(), "Z": Z.tolist()}, (
+        infeasible + "{} nearby feasible scenarios improve on it in every "
+        "outcome (marked \u2605)".format(len(X))
+    )
+
+
+# Re-optimise in a background process, with the pinned sliders fixed
+@app.callback(
+    Output("optimised-front", "data"),
+    Output("job-status", "children"),
+    Input("run-job", "n_clicks"),
+    *[State(slider, "value") for slider in slider_ids],
+    State("pinned", "value"),
+    State("threshold-gwp", "value"),
+    State("threshold-food", "value"),
+    State("threshold-birds", "value"),
+    State("job-population", "value"),
+    State("job-generations", "value"),
+    State("model-id", "value"),
+    background=True,
+    running=[
+        (Output("run-job", "disabled"), True, False),
+        (Output("cancel-job", "disabled"), False, True),
+    ],
+    cancel=[Input("cancel-job", "n_clicks")],
+    progress=[
+        Output("job-progress", "value"),
+        Output("job-progress", "max"),
+        Output("job-progress-text", "children"),
+    ],
+    prevent_initial_call=True,
+)
+def run_optimisation(set_progress, n_clicks, *values):
+    import jobs
+
+    ambitions = values[: len(slider_ids)]
+    (
+        pinned,
+        gwp_max,
+        food_min,
+        birds_min,
+        population,
+        generations,
+        model_id,
+    ) = values[len(slider_ids) :]
+    model = rs.registry().get(model_id)
+    picker = model.picker
+    params = jobs.job_parameters(
+        ambitions,
+        pinned or [],
+        (gwp_max, food_min, birds_min),
+        population or 200,
+        generations or 100,
+        model.surrogate,
+    )
+
+    def report(generation, total, hypervolume):
+        set_progress(
+            (
+                str(generation),
+                str(total),
+                "Generation {} of {}, hypervolume {:.4f}".format(
+                    generation, total, hypervolume
+                ),
+            )
+        )
+
+    key = jobs.optimise_front(
+        params,
+        report,
+        ideal=picker.ideal,
+        nadir=picker.nadir,
+        surrogate=model.surrogate,
+    )
+    front = jobs.load_front(key)
+    if front is None:
+        return None, "No feasible scenarios were found with these settings"
+    return key, "Showing {} re-optimised Pareto-optimal scenarios".format(
+        len(front)
+    )
+
+
+@app.callback(
+    Output("optimised-front", "data", allow_duplicate=True),
+    Output("job-status", "children", allow_duplicate=True),
+    Input("reset-front", "n_clicks"),
+    prevent_initial_call=True,
+)
+def show_stored_front(n_clicks):
+    return None, "Showing the stored Pareto front"
+
+
+# A new surrogate invalidates the shown front and "snap to front" candidates
+@app.callback(
+    Output("optimised-front", "data", allow_duplicate=True),
+    Output("snap-candidates", "data", allow_duplicate=True),
+    Output("model-status", "children"),
+    Input("model-id", "value"),
+    prevent_initial_call=True,
+)
+def switch_model(model_id):
+    spec = rs.registry().manifest.get(model_id, {})
+    return None, None, spec.get("description", "")
+
+
+@tm.timed(tm.map_seconds)
 def loadukmap_plotly(
     area_dict,
     grassland_value=0,
@@ -681,16 +1212,13 @@ def loadukmap_plotly(
         "not_used": "rgba(91, 91, 91, 0.8)",
     }
 
-    # Load file
-    geoData = gpd.read_file("geogHEXLA.json")
+    # Load file, once per process
+    geoData = rs.hex_geometry()
 
     # Create a plotly figure directly instead of going through matplotlib
     fig = go.Figure()
 
-    # Sort hexagons by y-coordinate to fill from bottom up
-    geoData["centroid_y"] = geoData.geometry.centroid.y
-    geoData = geoData.sort_values("centroid_y")
-
+    # Hexagons are sorted by y-coordinate to fill from bottom up
     # Calculate how many hexagons to fill based on grassland value
     total_hexagons = len(geoData)
 
@@ -785,6 +1313,11 @@ def loadukmap_plotly(
     return fig
 
 
+### Load the network, the Pareto front and the map in the background while
+### the server starts
+rs.warm_up()
+
+
 if __name__ == "__main__":
     # for backwards compatibility, use the `run_server` method if its defined otherwise
     # use `run`
@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Binary columnar cache for the CSV datasets.
+
+The first time a CSV is read it is converted, chunk by chunk, into one
+.npy file per column under data/.cache, in a directory named after the
+file and a hash of its absolute path, alongside a manifest recording the
+size, modification time and SHA-256 of the source. Later reads memory-map
+the columns read-only, so loading costs the same however large the file
+is; the source is only re-hashed when its size or timestamp change, and the
+cache is rebuilt only when the hash no longer matches.
+
+Each build writes a new version subdirectory and then atomically replaces
+the manifest that points to it, so readers never see a half-built or
+missing cache; the version it replaced is kept for readers still opening
+it, and older ones are removed.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+import tempfile
+import numpy as np
+import pandas as pd
+
+
+cache_root = os.path.join('data', '.cache')
+
+
+class ColumnTable:
+    """
+    Read-only columns of a cached CSV, with the feature and target split
+    used by the surrogate: the eight ambition_* columns after the leading
+    identifier column, then the three outputs.
+    """
+    def __init__(self, columns):
+        self.data = columns
+        self.columns = list(columns)
+        self.features = self.columns[1:9]
+        self.targets = self.columns[9:]
+        self.xspace = [self.columns.index(c) for c in self.features]
+        self.yspace = [self.columns.index(c) for c in self.targets]
+
+    def __getitem__(self, key):
+        if isinstance(key, str):
+            return self.data[key]
+        return self.array(key)
+
+    def __len__(self):
+        return len(self.data[self.columns[0]]) if self.columns else 0
+
+    def array(self, columns=None, dtype=float):
+        ### Stack the named columns into a new two-dimensional array
+        columns = self.columns if columns is None else columns
+        out = np.empty((len(self), len(columns)), dtype=dtype)
+        for i, column in enumerate(columns):
+            out[:,i] = self.data[column]
+        return out
+
+    def to_frame(self):
+        return pd.DataFrame({c: np.asarray(self.data[c]) for c in self.columns})
+
+
+def file_hash(path, block=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(block), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def _stat(path):
+    info = os.stat(path)
+    return {'size': info.st_size, 'mtime_ns': info.st_mtime_ns}
+
+def _cache_dir(path):
+    ### One directory per source file, however the path to it is written
+    name = os.path.splitext(os.path.basename(path))[0]
+    key = hashlib.sha1(os.path.realpath(path).encode()).hexdigest()[:12]
+    return os.path.join(cache_root, f'{name}-{key}')
+
+def _read_manifest(target):
+    manifest_path = os.path.join(target, 'manifest.json')
+    if not os.path.exists(manifest_path):
+        return None
+    with open(manifest_path) as f:
+        return json.load(f)
+
+def _write_manifest(target, manifest):
+    ### Replace the manifest in one step, so readers see the old or the new
+    fd, staging = tempfile.mkstemp(dir=target, suffix='.json')
+    with os.fdopen(fd, 'w') as f:
+        json.dump(manifest, f, indent=1)
+    os.replace(staging, os.path.join(target, 'manifest.json'))
+
+
+def build_cache(path, target, chunksize=100000):
+    """
+    Convert a CSV into per-column .npy files in two streaming passes, one to
+    count rows and one to fill memory-mapped outputs, so peak memory is
+    bounded by the chunk size.
+    """
+    header = pd.read_csv(path, nrows=0).columns.tolist()
+    n_rows = sum(len(c) for c in pd.read_csv(path, usecols=[0],
+                                             chunksize=chunksize))
+    os.makedirs(target, exist_ok=True)
+    staging = tempfile.mkdtemp(dir=target, prefix='.building-')
+    outputs = [np.lib.format.open_memmap(os.path.join(staging, f'{i}.npy'),
+                                         mode='w+', dtype=np.float64,
+                                         shape=(n_rows,))
+               for i in range(len(header))]
+    row = 0
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        for i, column in enumerate(header):
+            values = pd.to_numeric(chunk[column], errors='raise')
+            outputs[i][row:row+len(chunk)] = values.to_numpy(dtype=np.float64)
+        row += len(chunk)
+    for output in outputs:
+        output.flush()
+    del outputs
+    version = os.path.basename(staging)[len('.building-'):]
+    os.rename(staging, os.path.join(target, version))
+    manifest = {'source': os.path.abspath(path), 'sha256': file_hash(path),
+                'rows': n_rows, 'columns': header, 'version': version,
+                **_stat(path)}
+    previous = _read_manifest(target) or {}
+    _write_manifest(target, manifest)
+    ### Keep the version just replaced for readers that are opening it,
+    ### and skip the staging directories of concurrent builders
+    for entry in os.listdir(target):
+        if (os.path.isdir(os.path.join(target, entry))
+                and not entry.startswith('.building-')
+                and entry not in (version, previous.get('version'))):
+            shutil.rmtree(os.path.join(target, entry), ignore_errors=True)
+    return manifest
+
+
+def _valid_manifest(path, target):
+    manifest = _read_manifest(target)
+    if manifest is None or 'version' not in manifest:
+        return None
+    current = _stat(path)
+    if all(manifest[k] == current[k] for k in current):
+        return manifest
+    if manifest['sha256'] == file_hash(path):
+        ### Touched but unchanged, so record the new timestamp and reuse
+        manifest.update(current)
+        _write_manifest(target, manifest)
+        return manifest
+    return None
+
+def _open_columns(target, manifest):
+    version = os.path.join(target, manifest['version'])
+    return ColumnTable({name: np.load(os.path.join(version, f'{i}.npy'),
+                                      mmap_mode='r')
+                        for i, name in enumerate(manifest['columns'])})
+
+
+def load_table(path, cache_dir=None):
+    """
+    Load a CSV through the columnar cache, building or rebuilding the cache
+    if needed, and return its columns as read-only memory maps.
+    """
+    target = cache_dir or _cache_dir(path)
+    manifest = _valid_manifest(path, target)
+    if manifest is None:
+        manifest = build_cache(path, target)
+    try:
+        return _open_columns(target, manifest)
+    except FileNotFoundError:
+        ### Retired by concurrent rebuilds since the manifest was read
+        return _open_columns(target, _valid_manifest(path, target)
+                             or build_cache(path, target))
+
+
+if __name__ == "__main__":
+    import time
+    for path in ('data/miniLUSP_output.csv', 'data/Pareto_5000.csv'):
+        start = time.perf_counter()
+        pd.read_csv(path)
+        parsed = time.perf_counter() - start
+        load_table(path)
+        start = time.perf_counter()
+        table = load_table(path)
+        mapped = time.perf_counter() - start
+        print(f'{path}: {len(table)} rows, read_csv {parsed*1e3:.1f} ms, '
+              f'cached {mapped*1e3:.2f} ms')
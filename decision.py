@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Preference-weighted choice of a single scenario from a Pareto front.
+
+The front is normalised once by its ideal and nadir points, as at the end
+of NSGA_annmodel_optimisation.py, so each query is one vectorised
+achievement scalarising function (ASF) over the solutions that meet the
+user's thresholds, followed by an argmin. The closest Pareto-optimal
+alternative to any scenario is found from k-d trees over the normalised
+objectives and over the decision vectors, built with the front.
+"""
+
+import numpy as np
+import pareto_archive as pa
+from scipy.spatial import cKDTree
+
+
+class ParetoPicker:
+    """
+    Decision vectors X and outputs Z = [gwp_rel, food_rel, birds_rel] of a
+    Pareto front, with the objectives normalised to [0, 1] in the minimised
+    form used by the optimiser.
+    """
+    def __init__(self, X, Z):
+        self.X = np.ascontiguousarray(X, dtype=float)
+        self.Z = np.ascontiguousarray(Z, dtype=float)
+        F = self.Z * pa.objective_signs
+        self.ideal, self.nadir = F.min(axis=0), F.max(axis=0)
+        self.span = np.where(self.nadir > self.ideal, self.nadir - self.ideal, 1)
+        ### Stored by objective so the ASF is two elementwise maxima
+        self.nF = np.ascontiguousarray(((F - self.ideal) / self.span).T)
+        self.trees = {'objective': cKDTree(self.nF.T),
+                      'decision': cKDTree(self.X)}
+
+    @classmethod
+    def from_table(cls, table):
+        ### From a datastore.ColumnTable in the Pareto_5000.csv layout
+        return cls(table.array(table.features), table.array(table.targets))
+
+    def __len__(self):
+        return len(self.X)
+
+    def normalise(self, Z):
+        ### Outputs in natural units to the normalised objective space
+        return (np.asarray(Z, dtype=float) * pa.objective_signs
+                - self.ideal) / self.span
+
+    def nearest(self, point, space='objective'):
+        """
+        Index of the Pareto solution closest to a scenario and the Euclidean
+        distance to it, given the scenario's outputs in objective space or
+        its decision vector in decision space.
+        """
+        query = self.normalise(point) if space == 'objective' else point
+        distance, i = self.trees[space].query(np.asarray(query, dtype=float))
+        return int(i), float(distance)
+
+    def feasible(self, gwp_max=None, food_min=None, birds_min=None):
+        mask = np.ones(len(self), dtype=bool)
+        if gwp_max is not None:
+            mask &= self.Z[:,0] <= gwp_max
+        if food_min is not None:
+            mask &= self.Z[:,1] >= food_min
+        if birds_min is not None:
+            mask &= self.Z[:,2] >= birds_min
+        return mask
+
+    def pick(self, weights, gwp_max=None, food_min=None, birds_min=None):
+        """
+        Index of the solution minimising max(weights * normalised objectives)
+        among those meeting the thresholds, or None if none do. A zero weight
+        leaves that objective out; all-zero weights count every objective
+        equally.
+        """
+        weights = np.asarray(weights, dtype=float)
+        if not np.any(weights > 0):
+            weights = np.ones(3)
+        asf = np.maximum(np.maximum(weights[0] * self.nF[0],
+                                    weights[1] * self.nF[1]),
+                         weights[2] * self.nF[2])
+        mask = self.feasible(gwp_max, food_min, birds_min)
+        if not mask.any():
+            return None
+        asf[~mask] = np.inf
+        return int(np.argmin(asf))
+
+
+def improvement_score(base_distance, distance):
+    ### Percentage of the 2015 baseline's distance to the front closed
+    if base_distance <= 0 or distance >= base_distance:
+        return 0.0
+    return 100 * (1 - distance / base_distance)
+
+
+if __name__ == "__main__":
+    import time
+    import datastore as ds
+    picker = ParetoPicker.from_table(ds.load_table('data/Pareto_5000.csv'))
+    rng = np.random.default_rng(0)
+    queries = rng.random((10000, 3))
+    start = time.perf_counter()
+    for w in queries:
+        picker.pick(w, food_min=0.9)
+    elapsed = (time.perf_counter() - start) / len(queries)
+    print(f'{len(picker)} solutions: {elapsed*1e6:.0f} \N{MICRO SIGN}s per query')
+    for n in (len(picker), 10**5, 10**6):
+        large = ParetoPicker(rng.random((n, 8)), rng.random((n, 3)))
+        start = time.perf_counter()
+        for z in queries:
+            large.nearest(z)
+        elapsed = (time.perf_counter() - start) / len(queries)
+        print(f'{n} solutions: {elapsed*1e6:.0f} \N{MICRO SIGN}s per nearest query')
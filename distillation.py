@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Knowledge distillation of LandNET into lightweight students for bulk
+evaluation.
+
+The teacher is sampled densely over the feasible region defined by the
+optimiser bounds and the compiled land-use constraints, and two students
+are fitted to its outputs: a narrow MLP trained in torch, and a polynomial
+basis solved by least squares and evaluated with NumPy alone. Fidelity is
+reported both against the teacher on fresh samples and against the
+miniLUSP ground truth.
+"""
+
+import itertools
+import numpy as np
+import pandas as pd
+import torch
+import surrogate as sr
+import annmodel as am
+import distributed as dd
+from apollo import metrics as me
+from constraints import constraint_matrix, constraint_bounds
+
+
+### Upper bounds of the decision variables, as in LandscapeOptimisation
+upper_bounds = np.array([1, 1, 1, 1, 1, 0.35, 1, 1])
+
+
+def feasible_samples(n, seed=42, chunk=100000):
+    """
+    Uniform samples from the box [0, upper_bounds] that satisfy every
+    land-use constraint, drawn by rejection.
+    """
+    rng = np.random.default_rng(seed)
+    accepted, count = [], 0
+    while count < n:
+        X = rng.random((chunk, len(upper_bounds))) * upper_bounds
+        X = X[np.all(X @ constraint_matrix.T <= constraint_bounds, axis=1)]
+        accepted.append(X)
+        count += len(X)
+    return np.concatenate(accepted)[:n]
+
+
+class PolynomialSurrogate:
+    """
+    Total-degree polynomial response surface over the decision variables,
+    evaluated with NumPy only. Each monomial is built as the product of a
+    lower-degree monomial and one variable, so evaluation costs one
+    multiply per basis column.
+    """
+    def __init__(self, in_dim=8, degree=3, coefficients=None):
+        self.in_dim = in_dim
+        self.degree = degree
+        self.parents, self.factors = self._basis(in_dim, degree)
+        self.coefficients = coefficients
+
+    @staticmethod
+    def _basis(in_dim, degree):
+        ### Monomials as sorted variable tuples, each built from its prefix
+        terms = [()]
+        for d in range(1, degree + 1):
+            terms += list(itertools.combinations_with_replacement(
+                range(in_dim), d))
+        position = {term: i for i, term in enumerate(terms)}
+        parents = np.array([position[t[:-1]] if t else -1 for t in terms])
+        factors = np.array([t[-1] if t else -1 for t in terms])
+        return parents, factors
+
+    def features(self, X):
+        X = 2 * np.asarray(X, dtype=float) - 1
+        basis = np.empty((len(X), len(self.parents)))
+        basis[:,0] = 1
+        for i in range(1, len(self.parents)):
+            basis[:,i] = basis[:,self.parents[i]] * X[:,self.factors[i]]
+        return basis
+
+    def fit(self, X, Y, ridge=1e-8, chunk=100000):
+        ### Normal equations accumulated in chunks to bound memory
+        gram = ridge * len(X) * np.eye(len(self.parents))
+        moment = np.zeros((len(self.parents), Y.shape[1]))
+        for i in range(0, len(X), chunk):
+            basis = self.features(X[i:i+chunk])
+            gram += basis.T @ basis
+            moment += basis.T @ Y[i:i+chunk]
+        self.coefficients = np.linalg.solve(gram, moment)
+        return self
+
+    def predict(self, X, chunk=100000):
+        X = np.asarray(X, dtype=float)
+        single = X.ndim == 1
+        X = X.reshape(-1, self.in_dim)
+        Z = np.concatenate([self.features(X[i:i+chunk]) @ self.coefficients
+                            for i in range(0, max(len(X), 1), chunk)])
+        return Z[0] if single else Z
+
+    def save(self, path='student_poly.npz'):
+        np.savez(path, in_dim=self.in_dim, degree=self.degree,
+                 coefficients=self.coefficients)
+
+    @classmethod
+    def load(cls, path='student_poly.npz'):
+        archive = np.load(path)
+        return cls(int(archive['in_dim']), int(archive['degree']),
+                   archive['coefficients'])
+
+
+def distil_mlp(X, Z, widths=(32, 16), epochs=200, batch_size=4096, lr=0.002):
+    torch.manual_seed(42)
+    student = sr.LandNET(X.shape[1], Z.shape[1], widths=widths)
+    student.apply(sr.init_weights)
+    batches = dd.ShardedBatches(torch.from_numpy(X).float(),
+                                torch.from_numpy(Z).float(), batch_size)
+    sr.minibatch_training(student, batches, torch.device('cpu'),
+                          epochs=epochs, lr=lr, reporting_interval=20)
+    return student
+
+
+def fidelity(model, X, Z, label):
+    ### Agreement of a model with reference outputs Z, per target
+    predicted = sr.predict(model, X)
+    rows = []
+    for i, target in enumerate(['gwp_rel', 'food_rel', 'birds_rel']):
+        error = predicted[:,i] - Z[:,i]
+        rows.append({'reference': label, 'target': target,
+                     'r2': float(me.R2(Z[:,i], predicted[:,i])),
+                     'rmse': float(np.sqrt(np.mean(error**2))),
+                     'max_abs_error': float(np.abs(error).max())})
+    return rows
+
+
+def main(n_samples=1000000, degree=3, widths=(32, 16),
+         output='data/Distillation.csv'):
+    teacher = sr.load_model('model.pt')
+    X = feasible_samples(n_samples)
+    Z = sr.predict(teacher, X)
+    X_check = feasible_samples(n_samples // 10, seed=7)
+    Z_check = sr.predict(teacher, X_check)
+    df, features, targets, xspace, yspace = am.load_dataset()
+    X_true, Y_true = am.to_arrays(df, xspace, yspace)
+
+    ### Fit the students to the teacher
+    polynomial = PolynomialSurrogate(X.shape[1], degree).fit(X, Z)
+    polynomial.save('student_poly.npz')
+    mlp = distil_mlp(X, Z, widths)
+    torch.save(mlp, 'student_mlp.pt')
+
+    ### Fidelity to the teacher and to the miniLUSP ground truth
+    rows = [{'model': 'teacher', **row}
+            for row in fidelity(teacher, X_true, Y_true, 'miniLUSP')]
+    for name, student in (('polynomial', polynomial), ('mlp', mlp)):
+        for row in (fidelity(student, X_check, Z_check, 'teacher')
+                    + fidelity(student, X_true, Y_true, 'miniLUSP')):
+            rows.append({'model': name, **row})
+    report = pd.DataFrame(rows)
+    print(report.to_string(index=False))
+    report.to_csv(output, index=False)
+    return report
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+CPU data-parallel training of LandNET with torch.distributed and gloo.
+
+One process is spawned per rank on the local node. Every global mini-batch
+is drawn from a permutation shared by all ranks and split between them, and
+DistributedDataParallel all-reduces the gradients after each backward pass.
+Rank 0 writes the unwrapped network to the checkpoint, so the saved model
+loads without any parallel wrapper.
+"""
+
+import os
+import time
+import socket
+import tempfile
+import pandas as pd
+import torch
+import torch.distributed as dist
+import torch.multiprocessing as tmp
+import surrogate as sr
+from torch.nn.parallel import DistributedDataParallel
+
+
+class ShardedBatches:
+    """
+    Re-iterable mini-batches for one rank. Each pass reshuffles with a seed
+    shared across ranks and splits every row into near-equal global batches
+    of at most batch_size (all rows at once if None), and each global batch
+    is split so that every rank sees a disjoint, near-equal share of it.
+    """
+    def __init__(self, x, y, batch_size=None, rank=0, world_size=1, seed=42):
+        self.x, self.y = x, y
+        self.batch_size = batch_size or len(x)
+        self.rank, self.world_size = rank, world_size
+        self.seed = seed
+        self.epoch = 0
+        if len(x) == 0 or len(x) // len(self) < world_size:
+            raise ValueError(f'{len(x)} rows in batches of {self.batch_size} '
+                             f'leave a rank of {world_size} without data')
+
+    def __iter__(self):
+        generator = torch.Generator().manual_seed(self.seed + self.epoch)
+        order = torch.randperm(len(self.x), generator=generator)
+        self.epoch += 1
+        for batch in order.tensor_split(len(self)):
+            shard = batch.tensor_split(self.world_size)[self.rank]
+            yield self.x[shard], self.y[shard]
+
+    def __len__(self):
+        return max(1, -(-len(self.x) // self.batch_size))
+
+
+def _free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def _worker(rank, world_size, port, x, y, options, checkpoint, timings):
+    os.environ['MASTER_ADDR'] = '127.0.0.1'
+    os.environ['MASTER_PORT'] = str(port)
+    torch.set_num_threads(options['threads_per_process'])
+    dist.init_process_group('gloo', rank=rank, world_size=world_size)
+    try:
+        torch.manual_seed(options['seed'])
+        net = sr.LandNET(x.shape[1], y.shape[1], widths=options['widths'])
+        net.apply(sr.init_weights)
+        model = DistributedDataParallel(net)
+        batches = ShardedBatches(x, y, options['batch_size'], rank,
+                                 world_size, options['seed'])
+        dist.barrier()
+        start = time.perf_counter()
+        sr.minibatch_training(model, batches, torch.device('cpu'),
+                              epochs=options['epochs'], lr=options['lr'],
+                              reporting_interval=(options['reporting_interval']
+                                                  if rank == 0 else None))
+        dist.barrier()
+        elapsed = time.perf_counter() - start
+        if rank == 0:
+            timings.put(elapsed)
+            if checkpoint is not None:
+                torch.save(sr.unwrap(model), checkpoint)
+    finally:
+        dist.destroy_process_group()
+
+
+def train(x, y, processes=2, epochs=200, batch_size=1024, lr=0.0005,
+          widths=(256, 64, 16), threads_per_process=1, checkpoint=None,
+          reporting_interval=20, seed=42):
+    """
+    Train LandNET on x, y with one gloo rank per process and return the
+    unwrapped network from rank 0, together with the training wall time.
+    batch_size=None trains on every row at once, as surrogate.training
+    does, so the result is comparable with a single-process run.
+    """
+    options = dict(epochs=epochs, batch_size=batch_size, lr=lr,
+                   widths=tuple(widths), seed=seed,
+                   threads_per_process=threads_per_process,
+                   reporting_interval=reporting_interval)
+    x = torch.as_tensor(x).float().share_memory_()
+    y = torch.as_tensor(y).float().share_memory_()
+    timings = tmp.get_context('spawn').SimpleQueue()
+    with tempfile.TemporaryDirectory() as tmpdir:
+        target = checkpoint or os.path.join(tmpdir, 'model.pt')
+        tmp.spawn(_worker, nprocs=processes, join=True,
+                  args=(processes, _free_port(), x, y, options, target,
+                        timings))
+        net = sr.load_model(target)
+    return net, timings.get()
+
+
+def scaling_report(x, y, max_processes=None, epochs=20, batch_size=1024,
+                   threads_per_process=1):
+    """
+    Throughput of data-parallel training from one process up to
+    max_processes, relative to the single-process run.
+    """
+    if max_processes is None:
+        max_processes = max(1, (os.cpu_count() or 1) // threads_per_process)
+    rows = []
+    for processes in range(1, max_processes + 1):
+        _, elapsed = train(x, y, processes, epochs=epochs,
+                           batch_size=batch_size,
+                           threads_per_process=threads_per_process,
+                           reporting_interval=None)
+        rows.append({'processes': processes, 'seconds': elapsed,
+                     'samples_per_second': epochs * len(x) / elapsed})
+    report = pd.DataFrame(rows)
+    report['speedup'] = (report['samples_per_second']
+                         / report['samples_per_second'].iloc[0])
+    report['efficiency'] = report['speedup'] / report['processes']
+    return report
+
+
+if __name__ == "__main__":
+    import annmodel as am
+    df, features, targets, xspace, yspace = am.load_dataset()
+    X, Y = am.to_arrays(df, xspace, yspace)
+    print(scaling_report(X, Y).to_string(index=False))
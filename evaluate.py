@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Bulk evaluation of ambition_* scenarios with the LandNET surrogate.
+
+Scenarios arrive in chunks, from a CSV or (ND)JSON upload or a file on
+disk, and each chunk is scored in one batched forward pass together with
+the slack of every land-use constraint in constraints.py. The same chunk
+evaluator backs an HTTP endpoint registered on the dashboard's Flask
+server, which streams NDJSON or CSV back as chunks complete, and a
+command-line tool that spreads the chunks of arbitrarily large files over
+a process pool.
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import inspect
+import argparse
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+import pareto_archive as pa
+from constraints import constraints, constraint_matrix, constraint_bounds
+
+
+feature_columns = pa.decision_columns
+target_columns = pa.objective_columns
+constraint_columns = [f'constraint_{i+1:02d}' for i in range(len(constraints))]
+constraint_labels = dict(zip(constraint_columns, map(repr, constraints)))
+
+
+def evaluate_chunk(model, chunk, tol=1e-9):
+    """
+    Outputs and constraint satisfaction of a DataFrame of scenarios, which
+    must have the eight ambition_* columns; any other columns, such as a
+    scenario identifier, are passed through in front.
+    """
+    import surrogate as sr
+    missing = [c for c in feature_columns if c not in chunk.columns]
+    if missing:
+        raise ValueError(f"Scenarios are missing columns {missing}")
+    X = chunk[feature_columns].to_numpy(dtype=np.float32, copy=True)
+    if not np.isfinite(X).all():
+        raise ValueError("Scenarios must have finite ambition values")
+    Z = sr.predict(model, X).reshape(len(X), -1)
+    satisfied = X @ constraint_matrix.T <= constraint_bounds + tol
+    out = chunk.reset_index(drop=True).copy()
+    out[target_columns] = Z
+    out[constraint_columns] = satisfied
+    out['feasible'] = satisfied.all(axis=1)
+    return out
+
+
+### Input and output formats
+def read_chunks(source, fmt='csv', chunksize=100000):
+    ### Chunks of a CSV, a JSON array of records, or NDJSON lines
+    if fmt == 'csv':
+        yield from pd.read_csv(source, chunksize=chunksize)
+    elif fmt == 'ndjson':
+        yield from pd.read_json(source, lines=True, chunksize=chunksize)
+    elif fmt == 'json':
+        df = pd.read_json(source, orient='records')
+        for i in range(0, len(df), chunksize):
+            yield df.iloc[i:i+chunksize]
+    else:
+        raise ValueError(f"Unknown format {fmt}, expected csv, json or ndjson")
+
+def format_chunk(out, fmt='ndjson', header=False):
+    if fmt == 'csv':
+        return out.to_csv(index=False, header=header)
+    return out.to_json(orient='records', lines=True)
+
+def guess_format(path):
+    extension = os.path.splitext(path)[1].lower().lstrip('.')
+    return extension if extension in ('csv', 'json', 'ndjson') else 'csv'
+
+
+### HTTP endpoint
+def register(server, model, route='/api/evaluate', chunksize=10000):
+    """
+    Add a POST endpoint to a Flask server that evaluates an uploaded batch
+    of scenarios and streams the results back. The request body is CSV or
+    JSON (by Content-Type or ?input=), and the response NDJSON or CSV
+    (by ?format=, NDJSON by default). model may be a function returning
+    the model, to load it on the first request.
+
+    CSV and NDJSON bodies are read from the request stream a chunk at a
+    time; a JSON array has to be read whole. Problems with the header or
+    the first chunk give a 400, while a bad later chunk, found after the
+    results before it have been sent, ends the stream with an error
+    record: {"error": ..., "rows": <rows sent>} in NDJSON, or a last line
+    "error: ..." in CSV.
+    """
+    from flask import request, Response, stream_with_context
+
+    @server.route(route, methods=['POST'])
+    def evaluate_scenarios():
+        content_type = request.mimetype or ''
+        fmt_in = request.args.get('input') or (
+            'csv' if 'csv' in content_type
+            else 'ndjson' if 'ndjson' in content_type
+            else 'json' if 'json' in content_type else 'csv')
+        fmt_out = request.args.get('format', 'ndjson')
+        body = io.TextIOWrapper(request.stream,
+                                encoding=request.mimetype_params.get(
+                                    'charset', 'utf-8'), newline='')
+        net = model() if inspect.isfunction(model) else model
+        try:
+            chunks = read_chunks(body, fmt_in, chunksize)
+            first = evaluate_chunk(net, next(chunks))
+        except StopIteration:
+            return Response('', mimetype='application/x-ndjson')
+        except ValueError as error:
+            return Response(json.dumps({'error': str(error)}), status=400,
+                            mimetype='application/json')
+
+        def generate():
+            rows = len(first)
+            yield format_chunk(first, fmt_out, header=True)
+            try:
+                for chunk in chunks:
+                    out = evaluate_chunk(net, chunk)
+                    yield format_chunk(out, fmt_out)
+                    rows += len(out)
+            except ValueError as error:
+                ### The 200 is already sent, so end with the error instead
+                if fmt_out == 'csv':
+                    yield f'error: {error} after {rows} rows\n'
+                else:
+                    yield json.dumps({'error': str(error),
+                                      'rows': rows}) + '\n'
+
+        mimetype = 'text/csv' if fmt_out == 'csv' else 'application/x-ndjson'
+        return Response(stream_with_context(generate()), mimetype=mimetype)
+
+    return evaluate_scenarios
+
+
+### Command-line tool; torch is imported by the functions that need it so
+### that registering the endpoint does not load it
+_worker = {}
+
+def _initialise_worker(model_path, threads):
+    import torch
+    import surrogate as sr
+    torch.set_num_threads(threads)
+    _worker['model'] = sr.load_model(model_path)
+
+def _evaluate_in_worker(chunk):
+    return evaluate_chunk(_worker['model'], chunk)
+
+def evaluate_file(source, output, fmt_in=None, fmt_out=None,
+                  chunksize=100000, processes=1, model_path='model.pt'):
+    """
+    Evaluate a file of scenarios chunk by chunk, in order, across a pool of
+    processes each with one intra-op thread, writing results as they come.
+    Returns the number of rows and rows per second.
+    """
+    import torch
+    fmt_in = fmt_in or guess_format(source)
+    fmt_out = fmt_out or ('csv' if guess_format(output) == 'csv' else 'ndjson')
+    chunks = read_chunks(source, fmt_in, chunksize)
+    start, rows = time.perf_counter(), 0
+    with open(output, 'w', newline='') as f:
+        if processes > 1:
+            pool = mp.get_context('spawn').Pool(
+                processes, _initialise_worker, (model_path, 1))
+            results = pool.imap(_evaluate_in_worker, chunks)
+        else:
+            pool = None
+            _initialise_worker(model_path, torch.get_num_threads())
+            results = map(_evaluate_in_worker, chunks)
+        try:
+            for out in results:
+                f.write(format_chunk(out, fmt_out, header=rows == 0))
+                rows += len(out)
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+    elapsed = time.perf_counter() - start
+    return rows, rows / elapsed if elapsed else float('inf')
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Evaluate a file of ambition_* scenarios with LandNET.')
+    parser.add_argument('source', help='CSV, JSON or NDJSON scenarios')
+    parser.add_argument('output', help='results, as CSV or NDJSON')
+    parser.add_argument('--input-format', choices=('csv', 'json', 'ndjson'))
+    parser.add_argument('--output-format', choices=('csv', 'ndjson'))
+    parser.add_argument('--chunksize', type=int, default=100000)
+    parser.add_argument('--processes', type=int, default=1)
+    parser.add_argument('--model', default='model.pt')
+    args = parser.parse_args(argv)
+    rows, rate = evaluate_file(args.source, args.output, args.input_format,
+                               args.output_format, args.chunksize,
+                               args.processes, args.model)
+    print(f'{rows:,} scenarios evaluated, {rate:,.0f} rows/s', file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
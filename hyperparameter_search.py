@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Parallel hyperparameter and architecture search for the LandNET surrogate.
+
+Candidate configurations are trained concurrently in a process pool, with
+each worker pinned to its own slice of CPU cores and intra-op threads.
+Weak configurations are dropped by successive halving: every rung trains the
+survivors for a longer budget, scores them by R² on the annmodel held-out
+split, and keeps the best 1/eta of them. Every configuration is then timed
+for inference latency per row, and the results are written out as a table
+marking the Pareto-optimal trade-offs between accuracy and serving cost.
+"""
+
+import os
+import time
+import itertools
+import multiprocessing as mp
+import numpy as np
+import pandas as pd
+import torch
+import surrogate as sr
+import annmodel as am
+from dataclasses import dataclass, asdict
+from concurrent.futures import ProcessPoolExecutor
+from apollo import metrics as me
+
+
+### Architectures and optimiser settings explored by default
+search_space = {
+    'widths': [(256, 64, 16), (128, 32, 8), (64, 64, 16), (64, 16),
+               (32, 32), (32, 8), (16,)],
+    'lr': [0.0005, 0.001, 0.002],
+    'decay': [0, 1e-5],
+    }
+
+
+@dataclass
+class SearchConfig:
+    widths: tuple = (256, 64, 16)
+    lr: float = 0.0005
+    decay: float = 0
+
+def candidate_configs(space=search_space):
+    return [SearchConfig(tuple(w), lr, decay) for w, lr, decay
+            in itertools.product(space['widths'], space['lr'], space['decay'])]
+
+
+### Worker processes hold the dataset once and are pinned to a core slice
+_worker = {}
+
+def _initialise_worker(core_slices, threads):
+    cores = core_slices.get()
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+    torch.set_num_threads(threads)
+    df, features, targets, xspace, yspace = am.load_dataset()
+    df_train, df_test = am.holdout_split(df)
+    X, Y = am.to_arrays(df_train, xspace, yspace)
+    Xt, Yt = am.to_arrays(df_test, xspace, yspace)
+    _worker.update(x=torch.from_numpy(X), y=torch.from_numpy(Y),
+                   x_test=torch.from_numpy(Xt), y_test=Yt)
+
+def holdout_r2(net, x_test, y_test):
+    with torch.no_grad():
+        predicted = net(x_test.float()).numpy()
+    return [float(me.R2(y_test[:,i], predicted[:,i]))
+            for i in range(y_test.shape[1])]
+
+def _train_rung(config, epochs, state=None):
+    """
+    Train one configuration for a further number of epochs, resuming from
+    the network and optimiser state returned by the previous rung.
+    """
+    torch.manual_seed(42)
+    x, y = _worker['x'], _worker['y']
+    net = sr.LandNET(x.shape[1], y.shape[1], widths=config.widths)
+    optimizer = torch.optim.Adam(net.parameters(), lr=config.lr,
+                                 weight_decay=config.decay)
+    if state is None:
+        net.apply(sr.init_weights)
+    else:
+        net.load_state_dict(state['net'])
+        optimizer.load_state_dict(state['optimizer'])
+    losses = sr.training(net, x, y, torch.device('cpu'), epochs=epochs,
+                         reporting_interval=None, optimizer=optimizer)
+    return {'net': net.state_dict(), 'optimizer': optimizer.state_dict(),
+            'loss': float(losses[-1]),
+            'r2': holdout_r2(net, _worker['x_test'], _worker['y_test'])}
+
+
+def core_slices(n_workers, threads_per_worker):
+    if hasattr(os, 'sched_getaffinity'):
+        cores = sorted(os.sched_getaffinity(0))
+    else:
+        cores = list(range(os.cpu_count()))
+    return [set(cores[(i * threads_per_worker + j) % len(cores)]
+                for j in range(threads_per_worker)) for i in range(n_workers)]
+
+def successive_halving(configs, n_workers=None, threads_per_worker=1,
+                       min_epochs=500, max_epochs=16000, eta=3):
+    """
+    Run successive halving over the candidate configurations, returning one
+    record per configuration with the scores from the last rung it reached.
+    """
+    if n_workers is None:
+        n_workers = max(1, (os.cpu_count() or 1) // threads_per_worker)
+    context = mp.get_context('spawn')
+    slices = context.Queue()
+    for cores in core_slices(n_workers, threads_per_worker):
+        slices.put(cores)
+    records = [{'config': c, 'state': None, 'epochs': 0} for c in configs]
+    survivors = list(records)
+    budget = min_epochs
+    with ProcessPoolExecutor(max_workers=n_workers, mp_context=context,
+                             initializer=_initialise_worker,
+                             initargs=(slices, threads_per_worker)) as pool:
+        while survivors:
+            ### Train every survivor up to the current budget
+            jobs = [pool.submit(_train_rung, r['config'],
+                                budget - r['epochs'], r['state'])
+                    for r in survivors]
+            for record, job in zip(survivors, jobs):
+                record['state'] = job.result()
+                record['epochs'] = budget
+                config = record['config']
+                print('epochs {}, widths {}, lr {}, decay {}, R\N{SUPERSCRIPT TWO} {}'
+                      .format(budget, config.widths, config.lr, config.decay,
+                              np.round(record['state']['r2'], 4)))
+            if budget >= max_epochs:
+                break
+            ### Promote the best 1/eta configurations to the next rung
+            survivors.sort(key=lambda r: -np.mean(r['state']['r2']))
+            survivors = survivors[:max(1, len(survivors) // eta)]
+            budget = min(budget * eta, max_epochs)
+    return records
+
+
+def inference_latency(net, in_dim, bulk_rows=10000, repeats=200):
+    """
+    Seconds per row for single-scenario calls, as made by the dashboard, and
+    for large batches, as made by the optimiser.
+    """
+    net.eval()
+    single = torch.rand(in_dim)
+    bulk = torch.rand(bulk_rows, in_dim)
+    with torch.no_grad():
+        net(single)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            net(single)
+        batch_1 = (time.perf_counter() - start) / repeats
+        net(bulk)
+        start = time.perf_counter()
+        for _ in range(max(1, repeats // 20)):
+            net(bulk)
+        batch_n = (time.perf_counter() - start) / max(1, repeats // 20) / bulk_rows
+    return batch_1, batch_n
+
+def pareto_optimal(accuracy, cost):
+    """
+    Flag rows not beaten on both higher accuracy and lower cost.
+    """
+    order = np.lexsort((-accuracy, cost))
+    flags = np.zeros(len(order), dtype=bool)
+    best = -np.inf
+    for i in order:
+        if accuracy[i] > best:
+            flags[i] = True
+            best = accuracy[i]
+    return flags
+
+
+def main(output='data/Hyperparameter_search.csv', n_workers=None,
+         threads_per_worker=1, min_epochs=500, max_epochs=16000, eta=3):
+    records = successive_halving(candidate_configs(), n_workers,
+                                 threads_per_worker, min_epochs,
+                                 max_epochs, eta)
+    torch.set_num_threads(threads_per_worker)
+    rows = []
+    for record in records:
+        config = record['config']
+        net = sr.LandNET(8, 3, widths=config.widths)
+        net.load_state_dict(record['state']['net'])
+        batch_1, batch_n = inference_latency(net, 8)
+        r2 = record['state']['r2']
+        rows.append({**asdict(config),
+                     'parameters': sum(p.numel() for p in net.parameters()),
+                     'epochs': record['epochs'],
+                     'loss': record['state']['loss'],
+                     'r2_gwp': r2[0], 'r2_food': r2[1], 'r2_birds': r2[2],
+                     'r2_mean': np.mean(r2),
+                     'latency_batch1': batch_1,
+                     'latency_per_row': batch_n})
+    table = pd.DataFrame(rows)
+    table['pareto_optimal'] = pareto_optimal(table['r2_mean'].to_numpy(),
+                                             table['latency_batch1'].to_numpy())
+    table = table.sort_values(['pareto_optimal', 'r2_mean'],
+                              ascending=False).reset_index(drop=True)
+    print(table[table.pareto_optimal].to_string())
+    table.to_csv(output)
+    return table
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+"Snap to front": dominating alternatives near a given scenario.
+
+Starting from one decision vector, a small batch of candidates is moved by
+projected gradient descent on LandNET, each minimising a different
+weighting of the objectives with a penalty on getting worse in any of
+them. After every step the batch is projected back onto the land-use
+polytope from constraints.py by alternating projections onto the violated
+half-spaces and the box, and only candidates that dominate the starting
+scenario are returned.
+"""
+
+import numpy as np
+import torch
+import surrogate as sr
+import optimiser as op
+import pareto_archive as pa
+from constraints import constraint_matrix, constraint_bounds
+
+
+### Objective weightings in minimised form, one candidate each
+directions = np.array([[1, 0, 0], [0, 1, 0], [0, 0, 1],
+                       [1, 1, 0], [1, 0, 1], [0, 1, 1], [1, 1, 1]], dtype=float)
+
+
+def project(X, A=constraint_matrix, b=constraint_bounds,
+            lower=op.lower_bounds, upper=op.upper_bounds, sweeps=20, tol=1e-9):
+    """
+    Move each row of X into {lower <= x <= upper, A x <= b} by cyclic
+    projection onto the half-spaces it violates, then the box, until it
+    satisfies them all.
+    """
+    A = torch.as_tensor(A, dtype=X.dtype)
+    b = torch.as_tensor(b, dtype=X.dtype)
+    lower = torch.as_tensor(lower, dtype=X.dtype)
+    upper = torch.as_tensor(upper, dtype=X.dtype)
+    norms = (A * A).sum(1)
+    X = X.clamp(lower, upper)
+    for _ in range(sweeps):
+        excess = X @ A.T - b
+        if excess.max() <= tol:
+            break
+        for i in torch.nonzero((excess > tol).any(0)).squeeze(1).tolist():
+            excess_i = (X @ A[i] - b[i]).clamp_min(0)
+            X = X - excess_i[:,None] * A[i] / norms[i]
+        X = X.clamp(lower, upper)
+    return X
+
+def feasible(X, tol=1e-6):
+    return (np.all(X @ constraint_matrix.T <= constraint_bounds + tol, axis=1)
+            & np.all(X >= op.lower_bounds - tol, axis=1)
+            & np.all(X <= op.upper_bounds + tol, axis=1))
+
+
+def snap_to_front(model, x, scale=None, steps=40, lr=0.02, penalty=10.0):
+    """
+    Candidates near scenario x that dominate it, as decision vectors and
+    outputs [gwp_rel, food_rel, birds_rel]. scale divides each minimised
+    objective, e.g. the span of a Pareto front, to make them comparable.
+    x need not be feasible: the search starts from its projection onto the
+    feasible region, but the candidates must dominate x itself.
+    """
+    model = sr.unwrap(model)
+    scale = torch.ones(3) if scale is None else torch.as_tensor(
+        scale, dtype=torch.float32)
+    signs = torch.as_tensor(pa.objective_signs, dtype=torch.float32)
+    weights = torch.as_tensor(directions, dtype=torch.float32)
+    x = torch.as_tensor(np.asarray(x), dtype=torch.float32).reshape(1, -1)
+    with torch.no_grad():
+        F0 = model(x) * signs / scale
+    X = project(x).repeat(len(weights), 1).requires_grad_(True)
+    optimiser = torch.optim.Adam([X], lr=lr)
+    for _ in range(steps):
+        F = model(X) * signs / scale
+        loss = ((F * weights).sum(1)
+                + penalty * torch.relu(F - F0).sum(1)).sum()
+        optimiser.zero_grad()
+        loss.backward()
+        optimiser.step()
+        with torch.no_grad():
+            X.copy_(project(X))
+    with torch.no_grad():
+        Z = model(X)
+    X, Z = X.detach().numpy().astype(float), Z.numpy().astype(float)
+    F, F0 = Z * pa.objective_signs, (F0 * scale).numpy()
+    better = (np.all(F <= F0 + 1e-6, axis=1) & np.any(F < F0 - 1e-4, axis=1)
+              & feasible(X))
+    X, Z = X[better], Z[better]
+    _, unique = np.unique(np.round(X, 4), axis=0, return_index=True)
+    return X[np.sort(unique)], Z[np.sort(unique)]
+
+
+if __name__ == "__main__":
+    import time
+    net = sr.load_model('model.pt')
+    rng = np.random.default_rng(0)
+    starts = project(torch.as_tensor(rng.random((20, 8)) * op.upper_bounds,
+                                     dtype=torch.float32)).numpy()
+    snap_to_front(net, starts[0])
+    found, start = [], time.perf_counter()
+    for x in starts:
+        found.append(len(snap_to_front(net, x)[0]))
+    elapsed = (time.perf_counter() - start) / len(starts)
+    print(f'{elapsed*1e3:.1f} ms per scenario, '
+          f'{np.mean(found):.1f} dominating candidates on average')
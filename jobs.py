@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Constrained re-optimisation jobs run from the dashboard.
+
+A job runs the tensor NSGA-II engine with some land-use ambitions pinned
+and optional limits on the outcomes, reporting the generation and the
+hypervolume of the feasible front as it goes. Finished fronts are stored
+on disk in the Pareto.csv layout under a hash of the job parameters and
+the surrogate, so an identical request is answered without optimising.
+"""
+
+import os
+import json
+import hashlib
+import numpy as np
+import diskcache
+import optimiser as op
+import quantisation as qn
+import datastore as ds
+import decision as dc
+import hypervolume as hvt
+import pareto_archive as pa
+import telemetry as tm
+from functools import lru_cache
+
+
+fronts = diskcache.Cache(os.path.join(ds.cache_root, 'fronts'))
+
+### Part of every job's hash; raise it when the engine's results change,
+### e.g. 2 once the land-use constraints were enforced, to retire old fronts
+engine_version = 2
+
+### Largest job any dashboard user can start on the shared server
+population_limits = (10, int(os.environ.get('LANDSCAPE_JOB_MAX_POPULATION',
+                                            2000)))
+generation_limits = (2, int(os.environ.get('LANDSCAPE_JOB_MAX_GENERATIONS',
+                                           500)))
+
+def clamp(value, limits):
+    return min(max(int(value), limits[0]), limits[1])
+
+
+def job_parameters(ambitions, pinned=(), limits=(None, None, None),
+                   population_size=200, generations=100, surrogate='model.pt'):
+    """
+    Canonical description of a job: the pinned ambitions by slider order,
+    the outcome limits, the engine settings, clamped to the job limits,
+    the surrogate's hash and the engine version.
+    """
+    return {'pinned': {int(i): round(float(ambitions[i]), 4)
+                       for i in sorted(pinned)},
+            'limits': [None if l is None else round(float(l), 4)
+                       for l in limits],
+            'population_size': clamp(population_size, population_limits),
+            'generations': clamp(generations, generation_limits),
+            'surrogate': ds.file_hash(surrogate),
+            'engine': engine_version}
+
+def parameter_hash(params):
+    return hashlib.sha256(json.dumps(params, sort_keys=True).encode()
+                          ).hexdigest()
+
+
+def optimise_front(params, report=None, every=10, ideal=None, nadir=None,
+                   surrogate='model.pt'):
+    """
+    Run a job, or find it already done, and return its key in fronts.
+    report(generation, generations, hypervolume) is called every few
+    generations, with the hypervolume normalised by ideal and nadir.
+    surrogate is the path of the network that params were hashed with.
+    """
+    key = parameter_hash(params)
+    if key in fronts:
+        tm.cache_requests.inc(1, 'fronts', 'hit')
+        return key
+    tm.cache_requests.inc(1, 'fronts', 'miss')
+    ### Clamped again in case params did not come from job_parameters
+    population_size = clamp(params['population_size'], population_limits)
+    config = op.OptimizerConfig(population_size=population_size,
+                                offspring=population_size,
+                                max_generations=clamp(params['generations'],
+                                                      generation_limits),
+                                device='cpu')
+    xl = op.lower_bounds.astype(float)
+    xu = op.upper_bounds.astype(float)
+    for i, value in params['pinned'].items():
+        xl[int(i)] = xu[int(i)] = min(value, op.upper_bounds[int(i)])
+    engine = op.TensorNSGA2(qn.load_inference_model(surrogate, config.precision),
+                            config, xl=xl, xu=xu,
+                            limits=params['limits'])
+    tracker = hvt.HypervolumeTracker(ideal=ideal, nadir=nadir)
+
+    def progress(engine):
+        if report and (engine.n_gen % every == 0
+                       or engine.n_gen == config.max_generations):
+            _, F = engine.front()
+            report(engine.n_gen, config.max_generations, tracker.update(F))
+
+    X, F = engine.run(progress)
+    fronts[key] = pa.ParetoArchive().merge(F, X).to_frame()
+    return key
+
+@lru_cache(maxsize=16)
+def load_front(key):
+    ### A finished front as a ParetoPicker, or None if it is not stored
+    df = fronts.get(key)
+    if df is None or not len(df):
+        return None
+    return dc.ParetoPicker(df[pa.decision_columns].to_numpy(),
+                           df[pa.objective_columns].to_numpy())
+
+tm.watch_cache('load_front', lambda: load_front.cache_info()[:2])
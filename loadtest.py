@@ -0,0 +1,312 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Multi-user load test for the dashboard server.
+
+A trace is an NDJSON file of _dash-update-component requests, one per line
+as {"session": ..., "t": seconds, "payload": {...}}. Traces are recorded
+from real sessions by starting the dashboard with LANDSCAPE_RECORD_TRACE
+set to a file, or synthesised as seeded slider drags: bursts of updates at
+browser drag rate separated by pauses, each update sending every callback
+that listens to the dragged slider. Replaying a trace starts the app
+locally (or targets a running one), runs N simulated sessions over the
+trace's sessions with their original timing, and reports throughput,
+latency percentiles, the error rate and the server's CPU and memory. The
+same trace and seed give the same requests in the same order, so server
+configurations can be compared like-for-like:
+
+    python loadtest.py synthesise data/drag_trace.jsonl --sessions 8
+    python loadtest.py replay data/drag_trace.jsonl --users 16
+    python loadtest.py replay data/drag_trace.jsonl --users 16 \\
+        --command "gunicorn -w 4 -b 127.0.0.1:{port} dashboard:server"
+"""
+
+import os
+import sys
+import json
+import time
+import shlex
+import hashlib
+import argparse
+import threading
+import subprocess
+import numpy as np
+import psutil
+import requests
+
+
+update_route = '/_dash-update-component'
+default_command = ('{python} -c "import dashboard as d; '
+                   'd.app.run(host=\'127.0.0.1\', port={port})"')
+slider_ids = ['grassland', 'organic', 'peatland_lo', 'peatland_up',
+              'silvoa', 'silvop', 'woodland', 'woodpa']
+slider_maxima = [1, 1, 1, 1, 1, 0.35, 1, 1]
+
+
+### Recording from real sessions
+def record_traces(server, path):
+    """
+    Append every callback request reaching a Flask server to an NDJSON
+    trace, keyed by a hash of the client's address and user agent.
+    """
+    from flask import request
+    lock = threading.Lock()
+
+    @server.before_request
+    def record_update():
+        if not request.path.endswith(update_route):
+            return None
+        client = f'{request.remote_addr} {request.user_agent}'
+        line = json.dumps({
+            'session': hashlib.sha1(client.encode()).hexdigest()[:12],
+            't': time.time(),
+            'payload': request.get_json(silent=True)})
+        with lock:
+            with open(path, 'a') as f:
+                f.write(line + '\n')
+        return None
+
+def load_trace(path):
+    ### Requests per session, with times relative to the session's first
+    sessions = {}
+    with open(path) as f:
+        for line in f:
+            if line.strip():
+                event = json.loads(line)
+                sessions.setdefault(event['session'], []).append(
+                    (float(event['t']), event['payload']))
+    for name, events in sessions.items():
+        events.sort(key=lambda e: e[0])
+        sessions[name] = [(t - events[0][0], p) for t, p in events]
+    return [sessions[name] for name in sorted(sessions)]
+
+
+### Synthetic drag traces
+def _outputs(output):
+    ### Dash's output string, "id.prop" or "..id.prop...id.prop..", as dicts
+    multi = output.startswith('..')
+    parts = output.strip('.').split('...') if multi else [output]
+    outputs = [dict(zip(('id', 'property'), part.rsplit('.', 1)))
+               for part in parts]
+    return outputs if multi else outputs[0]
+
+def _initial_values(layout, values=None):
+    ### Every property of every component with an id in a Dash layout
+    values = {} if values is None else values
+    if isinstance(layout, dict):
+        props = layout.get('props', {})
+        if isinstance(props.get('id'), str):
+            for prop, value in props.items():
+                values[f'{props["id"]}.{prop}'] = value
+        for child in props.values():
+            _initial_values(child, values)
+    elif isinstance(layout, list):
+        for child in layout:
+            _initial_values(child, values)
+    return values
+
+def update_payloads(dependencies, values, changed):
+    ### Requests for every server callback triggered by one changed property
+    payloads = []
+    for dep in dependencies:
+        inputs = [f'{i["id"]}.{i["property"]}' for i in dep['inputs']]
+        if (changed not in inputs or dep.get('clientside_function')
+                or dep.get('background')):
+            continue
+        payloads.append({
+            'output': dep['output'],
+            'outputs': _outputs(dep['output']),
+            'inputs': [dict(i, value=values.get(f'{i["id"]}.{i["property"]}'))
+                       for i in dep['inputs']],
+            'changedPropIds': [changed],
+            'state': [dict(s, value=values.get(f'{s["id"]}.{s["property"]}'))
+                      for s in dep['state']]})
+    return payloads
+
+def synthesise(base_url, sessions=8, drags=5, steps=12, rate=25.0,
+               pause=(1.0, 4.0), seed=42):
+    """
+    Trace events of seeded slider drags: each session drags a random
+    slider to a random level in steps updates at rate per second, then
+    pauses, drags times over.
+    """
+    dependencies = requests.get(base_url + '/_dash-dependencies').json()
+    layout = requests.get(base_url + '/_dash-layout').json()
+    rng = np.random.default_rng(seed)
+    events = []
+    for s in range(sessions):
+        values, t = _initial_values(layout), 0.0
+        for _ in range(drags):
+            k = int(rng.integers(len(slider_ids)))
+            changed = f'{slider_ids[k]}.value'
+            start = float(values.get(changed) or 0)
+            target = float(rng.uniform(0, slider_maxima[k]))
+            for level in np.linspace(start, target, steps + 1)[1:]:
+                values[changed] = round(float(level), 4)
+                for payload in update_payloads(dependencies, values, changed):
+                    events.append({'session': f's{s:03d}', 't': round(t, 3),
+                                   'payload': payload})
+                t += 1 / rate
+            t += float(rng.uniform(*pause))
+    return events
+
+
+### Server and resource monitoring
+def start_server(command=default_command, port=8052, timeout=900):
+    ### Launch the app and wait until it serves its layout
+    process = subprocess.Popen(
+        shlex.split(command.format(python=sys.executable, port=port)),
+        cwd=os.path.dirname(os.path.abspath(__file__)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f'http://127.0.0.1:{port}'
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Server exited with code {process.returncode}')
+        try:
+            if requests.get(url + '/_dash-layout', timeout=5).ok:
+                return process, url
+        except requests.ConnectionError:
+            pass
+        time.sleep(1)
+    process.terminate()
+    raise TimeoutError(f'Server did not start within {timeout} s')
+
+class ResourceMonitor(threading.Thread):
+    ### CPU percent and RSS of a process and its children, sampled
+    def __init__(self, pid, interval=0.5):
+        super().__init__(daemon=True)
+        self.root = psutil.Process(pid)
+        self.interval = interval
+        self.cpu, self.rss = [], []
+        self._processes = {}
+        self._done = threading.Event()
+
+    def _sample(self):
+        cpu = rss = 0.0
+        for process in [self.root] + self.root.children(recursive=True):
+            try:
+                process = self._processes.setdefault(process.pid, process)
+                cpu += process.cpu_percent()
+                rss += process.memory_info().rss
+            except psutil.NoSuchProcess:
+                self._processes.pop(process.pid, None)
+        return cpu, rss
+
+    def run(self):
+        self._sample()
+        while not self._done.wait(self.interval):
+            cpu, rss = self._sample()
+            self.cpu.append(cpu)
+            self.rss.append(rss)
+
+    def stop(self):
+        self._done.set()
+        self.join()
+
+
+### Replay
+def replay(base_url, trace, users=8, speed=1.0, stagger=0.25, timeout=60):
+    """
+    Replay a trace with users simulated sessions, user k taking trace
+    session k modulo their number and starting k*stagger seconds in. Each
+    session sends its requests in order, on schedule or as soon as the
+    previous one returns. Returns per-request (latency, ok) and wall time.
+    """
+    results = [[] for _ in range(users)]
+    barrier = threading.Barrier(users + 1)
+
+    def session(k):
+        events = trace[k % len(trace)]
+        with requests.Session() as http:
+            barrier.wait()
+            start = time.perf_counter() + k * stagger
+            for t, payload in events:
+                delay = start + t / speed - time.perf_counter()
+                if delay > 0:
+                    time.sleep(delay)
+                sent = time.perf_counter()
+                try:
+                    ok = http.post(base_url + update_route, json=payload,
+                                   timeout=timeout).ok
+                except requests.RequestException:
+                    ok = False
+                results[k].append((time.perf_counter() - sent, ok))
+
+    threads = [threading.Thread(target=session, args=(k,))
+               for k in range(users)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    return [r for user in results for r in user], time.perf_counter() - start
+
+def summarise(results, elapsed, monitor=None):
+    latency = np.array([r[0] for r in results]) * 1e3
+    errors = sum(not r[1] for r in results)
+    summary = {'requests': len(results),
+               'throughput_rps': len(results) / elapsed,
+               'p50_ms': float(np.percentile(latency, 50)),
+               'p95_ms': float(np.percentile(latency, 95)),
+               'p99_ms': float(np.percentile(latency, 99)),
+               'error_rate': errors / max(len(results), 1)}
+    if monitor is not None and monitor.cpu:
+        summary.update({'cpu_mean_percent': float(np.mean(monitor.cpu)),
+                        'cpu_max_percent': float(np.max(monitor.cpu)),
+                        'rss_max_mib': float(np.max(monitor.rss)) / 2**20})
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Record, synthesise and replay dashboard load traces.')
+    parser.add_argument('action', choices=('synthesise', 'replay'))
+    parser.add_argument('trace', help='NDJSON trace to write or replay')
+    parser.add_argument('--url', help='use a running server, e.g. '
+                        'http://127.0.0.1:8051, rather than starting one')
+    parser.add_argument('--command', default=default_command,
+                        help='server command, with {port} and {python}')
+    parser.add_argument('--port', type=int, default=8052)
+    parser.add_argument('--sessions', type=int, default=8)
+    parser.add_argument('--drags', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--users', type=int, default=8)
+    parser.add_argument('--speed', type=float, default=1.0)
+    parser.add_argument('--output', help='also write the summary as JSON')
+    args = parser.parse_args(argv)
+
+    process, url = (None, args.url) if args.url else start_server(
+        args.command, args.port)
+    try:
+        if args.action == 'synthesise':
+            events = synthesise(url, args.sessions, args.drags, seed=args.seed)
+            with open(args.trace, 'w') as f:
+                f.writelines(json.dumps(e) + '\n' for e in events)
+            print(f'{len(events)} requests in {args.sessions} sessions '
+                  f'written to {args.trace}')
+            return
+        monitor = ResourceMonitor(process.pid) if process else None
+        if monitor:
+            monitor.start()
+        results, elapsed = replay(url, load_trace(args.trace), args.users,
+                                  args.speed)
+        if monitor:
+            monitor.stop()
+        summary = summarise(results, elapsed, monitor)
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+    for key, value in summary.items():
+        print(f'{key:>18}: {value:,.3f}' if isinstance(value, float)
+              else f'{key:>18}: {value:,}')
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(dict(summary, users=args.users, command=args.command,
+                           trace=args.trace), f, indent=1)
+
+
+if __name__ == "__main__":
+    main()
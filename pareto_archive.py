@@ -0,0 +1,316 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Non-dominated archive for three-objective Pareto fronts.
+
+Objectives follow the pymoo convention used by LandscapeOptimisation, i.e.
+everything is minimised: [gwp_rel, -food_rel, -birds_rel]. Bulk filtering
+uses an O(n log n) sweep over the first objective with a two-dimensional
+staircase of the other two; incremental insertion and dominance queries
+use an ND-tree (Jaszkiewicz & Lust, 2018), whose nodes carry the ideal and
+nadir points of their subtree so that whole branches can be accepted,
+rejected or skipped without visiting their points.
+"""
+
+import time
+import numpy as np
+import pandas as pd
+from bisect import bisect_left, bisect_right
+
+
+decision_columns = ['ambition_grassland', 'ambition_organic',
+                    'ambition_peatland_lo', 'ambition_peatland_up',
+                    'ambition_silvoa', 'ambition_silvop', 'ambition_woodland',
+                    'ambition_woodpa']
+objective_columns = ['gwp_rel', 'food_rel', 'birds_rel']
+objective_signs = np.array([1, -1, -1])
+
+
+def nondominated_mask(F):
+    """
+    Mask of the rows of an (n, 3) array that no other row weakly dominates,
+    keeping the first of any exact duplicates.
+    """
+    F = np.asarray(F, dtype=float)
+    order = np.lexsort((F[:,2], F[:,1], F[:,0]))
+    mask = np.zeros(len(F), dtype=bool)
+    ### Staircase of (f1, f2) seen so far: f1 ascending, f2 descending
+    stair_1, stair_2 = [], []
+    for i in order:
+        f1, f2 = F[i,1], F[i,2]
+        j = bisect_right(stair_1, f1)
+        if j and stair_2[j-1] <= f2:
+            continue
+        mask[i] = True
+        k = bisect_left(stair_1, f1)
+        end = k
+        while end < len(stair_1) and stair_2[end] >= f2:
+            end += 1
+        stair_1[k:end] = [f1]
+        stair_2[k:end] = [f2]
+    return mask
+
+
+def _weakly_dominates(a, b):
+    return a[0] <= b[0] and a[1] <= b[1] and a[2] <= b[2]
+
+
+class _Node:
+    __slots__ = ('ideal', 'nadir', 'points', 'children')
+
+    def __init__(self):
+        self.ideal = [np.inf] * 3
+        self.nadir = [-np.inf] * 3
+        self.points = []
+        self.children = None
+
+    def extend_bounds(self, f):
+        for d in range(3):
+            if f[d] < self.ideal[d]:
+                self.ideal[d] = f[d]
+            if f[d] > self.nadir[d]:
+                self.nadir[d] = f[d]
+
+    def empty(self):
+        return not (self.points or self.children)
+
+
+class ParetoArchive:
+    """
+    Mutually non-dominating set of objective vectors, each with its
+    decision vector, held in an ND-tree.
+    """
+    def __init__(self, max_leaf=20, branching=4):
+        self.max_leaf = max_leaf
+        self.branching = branching
+        self.root = _Node()
+        self.F = {}
+        self.X = {}
+        self.next_id = 0
+
+    def __len__(self):
+        return len(self.F)
+
+    ### Queries
+    def is_dominated(self, f):
+        """
+        Whether any archived point weakly dominates f.
+        """
+        f = tuple(float(v) for v in f)
+        stack = [self.root]
+        while stack:
+            node = stack.pop()
+            if node.empty() or not _weakly_dominates(node.ideal, f):
+                continue
+            if _weakly_dominates(node.nadir, f):
+                return True
+            if node.children is None:
+                if any(_weakly_dominates(self.F[p], f) for p in node.points):
+                    return True
+            else:
+                stack.extend(node.children)
+        return False
+
+    ### Updates
+    def insert(self, f, x=None):
+        """
+        Add a point unless it is weakly dominated, removing every archived
+        point it dominates. Returns whether the point was added.
+        """
+        f = tuple(float(v) for v in f)
+        if self.root.empty():
+            self.root = _Node()
+            self._add(self.root, f, x)
+            return True
+        if not self._update(self.root, f):
+            return False
+        self._add(self.root, f, x)
+        return True
+
+    def _update(self, node, f):
+        ### Remove points dominated by f; False if f itself is dominated
+        if _weakly_dominates(node.nadir, f):
+            return False
+        if _weakly_dominates(f, node.ideal):
+            self._discard(node)
+            return True
+        if not (_weakly_dominates(f, node.nadir)
+                or _weakly_dominates(node.ideal, f)):
+            return True
+        if node.children is None:
+            kept = []
+            for p in node.points:
+                if _weakly_dominates(self.F[p], f):
+                    return False
+                if _weakly_dominates(f, self.F[p]):
+                    del self.F[p]
+                    self.X.pop(p, None)
+                else:
+                    kept.append(p)
+            node.points = kept
+        else:
+            for child in node.children:
+                if not self._update(child, f):
+                    return False
+            node.children = [c for c in node.children if not c.empty()]
+            if not node.children:
+                node.children = None
+        return True
+
+    def _discard(self, node):
+        stack = [node]
+        while stack:
+            n = stack.pop()
+            for p in n.points:
+                del self.F[p]
+                self.X.pop(p, None)
+            stack.extend(n.children or [])
+            n.points, n.children = [], None
+
+    def _add(self, node, f, x):
+        pid = self.next_id
+        self.next_id += 1
+        self.F[pid] = f
+        if x is not None:
+            self.X[pid] = np.asarray(x, dtype=float)
+        self._place(node, pid)
+
+    def _place(self, node, pid):
+        f = self.F[pid]
+        while True:
+            node.extend_bounds(f)
+            if node.children is None:
+                node.points.append(pid)
+                if len(node.points) > self.max_leaf:
+                    self._split(node)
+                return
+            node = min(node.children, key=lambda c: sum(
+                ((c.ideal[d] + c.nadir[d]) / 2 - f[d])**2 for d in range(3)))
+
+    def _split(self, node):
+        ### Farthest-point seeds, then every point joins its nearest seed
+        points = np.array([self.F[p] for p in node.points])
+        seeds = [int(np.argmax(np.abs(points - points.mean(axis=0)).sum(axis=1)))]
+        distance = np.linalg.norm(points - points[seeds[0]], axis=1)
+        while len(seeds) < self.branching:
+            seeds.append(int(np.argmax(distance)))
+            distance = np.minimum(distance, np.linalg.norm(
+                points - points[seeds[-1]], axis=1))
+        nearest = np.argmin(np.linalg.norm(
+            points[:,None,:] - points[seeds][None,:,:], axis=2), axis=1)
+        node.children = []
+        for s in range(len(seeds)):
+            child = _Node()
+            for i in np.where(nearest == s)[0]:
+                child.points.append(node.points[i])
+                child.extend_bounds(self.F[node.points[i]])
+            if child.points:
+                node.children.append(child)
+        node.points = []
+
+    ### Bulk operations
+    def arrays(self):
+        ids = list(self.F)
+        F = np.array([self.F[p] for p in ids]).reshape(-1, 3)
+        X = (np.array([self.X[p] for p in ids]) if self.X
+             and len(self.X) == len(ids) else None)
+        return F, X
+
+    def merge(self, F, X=None):
+        """
+        Merge a batch of points in O(n log n), keeping the non-dominated
+        union and rebuilding the tree from it.
+        """
+        F = np.asarray(F, dtype=float).reshape(-1, 3)
+        old_F, old_X = self.arrays()
+        all_F = np.vstack((old_F, F))
+        if X is None or (len(old_F) and old_X is None):
+            all_X = None
+        else:
+            all_X = np.vstack((old_X, X)) if len(old_F) else np.asarray(X)
+        mask = nondominated_mask(all_F)
+        rebuilt = ParetoArchive(self.max_leaf, self.branching)
+        for i in np.where(mask)[0]:
+            rebuilt._add(rebuilt.root, tuple(all_F[i]),
+                         None if all_X is None else all_X[i])
+        self.__dict__.update(rebuilt.__dict__)
+        return self
+
+    def thin(self, epsilon):
+        """
+        Additive epsilon-dominance thinning: one representative per
+        epsilon-box, the one nearest the box corner, from non-dominated
+        boxes only.
+        """
+        F, X = self.arrays()
+        if not len(F):
+            return ParetoArchive(self.max_leaf, self.branching)
+        epsilon = np.broadcast_to(np.asarray(epsilon, dtype=float), (3,))
+        scaled = (F - F.min(axis=0)) / epsilon
+        boxes = np.floor(scaled)
+        corner = np.linalg.norm(scaled - boxes, axis=1)
+        order = np.lexsort((corner,) + tuple(boxes.T[::-1]))
+        _, first = np.unique(boxes[order], axis=0, return_index=True)
+        representatives = order[first]
+        keep = representatives[nondominated_mask(boxes[representatives])]
+        return ParetoArchive(self.max_leaf, self.branching).merge(
+            F[keep], None if X is None else X[keep])
+
+    ### Pareto.csv layout
+    def to_frame(self):
+        F, X = self.arrays()
+        if X is None:
+            X = np.full((len(F), len(decision_columns)), np.nan)
+        return pd.DataFrame(np.hstack((X, F * objective_signs)),
+                            columns=decision_columns + objective_columns)
+
+    def to_csv(self, path='Pareto.csv'):
+        self.to_frame().to_csv(path)
+
+    @classmethod
+    def from_frame(cls, df, **kwargs):
+        F = df[objective_columns].to_numpy(dtype=float) * objective_signs
+        X = df[decision_columns].to_numpy(dtype=float)
+        return cls(**kwargs).merge(F, X)
+
+    @classmethod
+    def from_csv(cls, path='Pareto.csv', **kwargs):
+        return cls.from_frame(pd.read_csv(path, index_col=0), **kwargs)
+
+
+def _synthetic_front(n, seed=0, noise=0.05):
+    ### Points near the positive octant of the unit sphere
+    rng = np.random.default_rng(seed)
+    F = np.abs(rng.normal(size=(n, 3)))
+    F /= np.linalg.norm(F, axis=1, keepdims=True)
+    return F * (1 + noise * rng.random((n, 1)))
+
+def benchmark(sizes=(10**5, 10**6), n_updates=10000):
+    for n in sizes:
+        F = _synthetic_front(n)
+        start = time.perf_counter()
+        mask = nondominated_mask(F)
+        sweep = time.perf_counter() - start
+        start = time.perf_counter()
+        archive = ParetoArchive().merge(F)
+        merge = time.perf_counter() - start
+        probes = _synthetic_front(n_updates, seed=1)
+        start = time.perf_counter()
+        for f in probes:
+            archive.is_dominated(f)
+        query = (time.perf_counter() - start) / n_updates
+        start = time.perf_counter()
+        for f in probes:
+            archive.insert(f)
+        insert = (time.perf_counter() - start) / n_updates
+        start = time.perf_counter()
+        thinned = archive.thin(0.01)
+        thin = time.perf_counter() - start
+        print(f'n={n:,}: front {mask.sum():,}, sweep {sweep:.2f} s, '
+              f'merge {merge:.2f} s, query {query*1e6:.0f} \N{MICRO SIGN}s, '
+              f'insert {insert*1e6:.0f} \N{MICRO SIGN}s, '
+              f'thin(0.01) {thin:.2f} s to {len(thinned):,}')
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Opt-in profiling of a sample of the dashboard's callback requests.
+
+With LANDSCAPE_PROFILE_EVERY=N set, one in every N _dash-update-component
+requests is run under cProfile, and with LANDSCAPE_PROFILE_MEMORY=1 also
+under tracemalloc. Each sample is written to LANDSCAPE_PROFILE_DIR as a
+pstats file plus a JSON sidecar with the callback name, the request's
+input values and the largest allocations, keeping the newest
+LANDSCAPE_PROFILE_KEEP samples. Only one request is profiled at a time,
+since profilers are process-wide; a sampled request that arrives while
+another is being profiled is simply served unprofiled. When the variable
+is unset no hooks are installed at all.
+
+    python -m pstats data/profiles/<sample>.prof
+"""
+
+import os
+import json
+import time
+import glob
+import cProfile
+import itertools
+import threading
+import tracemalloc
+
+
+class SampledProfiler:
+    def __init__(self, every, directory='data/profiles', keep=50,
+                 memory=False):
+        self.every = every
+        self.directory = directory
+        self.keep = keep
+        self.memory = memory
+        self._calls = itertools.count(1)
+        self._busy = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def start(self):
+        ### A running profile for this call if it is sampled, else None
+        call = next(self._calls)
+        if call % self.every or not self._busy.acquire(False):
+            return None
+        if self.memory:
+            tracemalloc.start()
+        profile = cProfile.Profile()
+        profile.enable()
+        return profile, time.perf_counter(), call
+
+    def finish(self, sample, callback, inputs):
+        profile, start, call = sample
+        profile.disable()
+        elapsed = time.perf_counter() - start
+        try:
+            allocations = []
+            if self.memory:
+                snapshot = tracemalloc.take_snapshot()
+                tracemalloc.stop()
+                allocations = [{'line': str(stat.traceback),
+                                'kib': stat.size / 1024, 'blocks': stat.count}
+                               for stat in snapshot.statistics('lineno')[:20]]
+            stem = os.path.join(self.directory, '{}_{:07d}_{}'.format(
+                time.strftime('%Y%m%d-%H%M%S'), call, callback))
+            profile.dump_stats(stem + '.prof')
+            with open(stem + '.json', 'w') as f:
+                json.dump({'callback': callback, 'inputs': inputs,
+                           'seconds': elapsed, 'allocations': allocations},
+                          f, indent=1)
+            self.rotate()
+        finally:
+            self._busy.release()
+
+    def rotate(self):
+        ### Delete all but the newest keep samples
+        samples = sorted(glob.glob(os.path.join(self.directory, '*.prof')),
+                         key=os.path.getmtime)
+        for path in samples[:-self.keep]:
+            for old in (path, path[:-len('.prof')] + '.json'):
+                if os.path.exists(old):
+                    os.remove(old)
+
+
+def from_environment():
+    every = int(os.environ.get('LANDSCAPE_PROFILE_EVERY', 0))
+    if every <= 0:
+        return None
+    return SampledProfiler(
+        every, os.environ.get('LANDSCAPE_PROFILE_DIR', 'data/profiles'),
+        int(os.environ.get('LANDSCAPE_PROFILE_KEEP', 50)),
+        os.environ.get('LANDSCAPE_PROFILE_MEMORY', '') not in ('', '0'))
+
+
+def register(app, profiler=None):
+    """
+    Profile a sample of a Dash app's callback requests, tagging each with
+    the callback's name and its input values. Does nothing unless a
+    profiler is given or configured in the environment.
+    """
+    profiler = profiler or from_environment()
+    if profiler is None:
+        return None
+    from flask import request, g
+    server = app.server
+
+    @server.before_request
+    def start_profile():
+        if request.path.endswith('_dash-update-component'):
+            g.profile = profiler.start()
+
+    @server.teardown_request
+    def finish_profile(error=None):
+        sample = g.pop('profile', None)
+        if sample is None:
+            return
+        payload = request.get_json(silent=True) or {}
+        entry = app.callback_map.get(payload.get('output', ''), {})
+        callback = getattr(entry.get('callback'), '__name__', 'unknown')
+        inputs = {f'{i.get("id")}.{i.get("property")}': i.get('value')
+                  for i in payload.get('inputs', []) if isinstance(i, dict)}
+        profiler.finish(sample, callback, inputs)
+
+    return profiler
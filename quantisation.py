@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Reduced-precision CPU inference for the LandNET surrogate.
+
+A trained float32 network can be served either with dynamic int8
+quantisation of its linear layers or in bfloat16. Any reduced-precision
+model is checked against the float model on the miniLUSP outputs before it
+is used, and the float model is kept whenever the loss of R² on any target
+exceeds the configured tolerance.
+"""
+
+import os
+import copy
+import time
+import warnings
+import numpy as np
+import torch
+import torch.nn as nn
+import surrogate as sr
+
+
+precisions = ('float32', 'int8', 'bfloat16')
+
+
+class ReducedPrecision(nn.Module):
+    """
+    Wrap a network converted to int8 or bfloat16 so that it accepts and
+    returns float32 tensors, including single unbatched scenarios, and can
+    stand in for the original.
+    """
+    def __init__(self, net, precision='int8'):
+        super(ReducedPrecision, self).__init__()
+        self.precision = precision
+        net = copy.deepcopy(sr.unwrap(net)).eval()
+        if precision == 'int8':
+            self.dtype = torch.float32
+            with warnings.catch_warnings():
+                warnings.simplefilter('ignore')
+                self.net = torch.ao.quantization.quantize_dynamic(
+                    net, {nn.Linear}, dtype=torch.qint8)
+        elif precision == 'bfloat16':
+            self.dtype = torch.bfloat16
+            self.net = net.to(torch.bfloat16)
+        else:
+            raise ValueError(f"Unknown precision {precision}, expected one of {precisions}")
+
+    def forward(self, z):
+        shape = z.shape
+        z = self.net(z.to(self.dtype).reshape(-1, shape[-1]))
+        return z.float().reshape(*shape[:-1], z.shape[-1])
+
+
+def bfloat16_supported():
+    try:
+        with torch.no_grad():
+            nn.Linear(2, 2).to(torch.bfloat16)(torch.ones(1, 2,
+                                                         dtype=torch.bfloat16))
+        return True
+    except RuntimeError:
+        return False
+
+def quantise(net, precision='int8'):
+    if precision == 'float32':
+        return sr.unwrap(net).eval()
+    if precision == 'bfloat16' and not bfloat16_supported():
+        raise RuntimeError('bfloat16 inference is not supported on this CPU')
+    return ReducedPrecision(net, precision).eval()
+
+
+def validate(reference, candidate, path='data/miniLUSP_output.csv'):
+    """
+    Compare a reduced-precision model with the float model on the miniLUSP
+    outputs, returning per-target R² for both and the largest deviation of
+    the candidate's predictions from the reference's.
+    """
+    ### Only reduced-precision models need the training code and apollo
+    import annmodel as am
+    from apollo import metrics as me
+    df, features, targets, xspace, yspace = am.load_dataset(path)
+    X, Y = am.to_arrays(df, xspace, yspace)
+    x = torch.from_numpy(X).float()
+    with torch.no_grad():
+        expected = reference(x).numpy()
+        predicted = candidate(x).numpy()
+    report = {}
+    for i, target in enumerate(targets):
+        r2_ref = float(me.R2(Y[:,i], expected[:,i]))
+        r2_new = float(me.R2(Y[:,i], predicted[:,i]))
+        report[target] = {'r2_float32': r2_ref, 'r2_reduced': r2_new,
+                          'r2_loss': r2_ref - r2_new,
+                          'max_abs_deviation': float(np.abs(
+                              expected[:,i] - predicted[:,i]).max())}
+    return report
+
+
+def benchmark(net, bulk_rows=100000, repeats=1000):
+    """
+    Batch-1 latency in seconds and large-batch throughput in rows/second.
+    """
+    single = torch.rand(8)
+    bulk = torch.rand(bulk_rows, 8)
+    with torch.no_grad():
+        net(single)
+        start = time.perf_counter()
+        for _ in range(repeats):
+            net(single)
+        latency = (time.perf_counter() - start) / repeats
+        net(bulk)
+        start = time.perf_counter()
+        for _ in range(10):
+            net(bulk)
+        throughput = 10 * bulk_rows / (time.perf_counter() - start)
+    return latency, throughput
+
+
+def load_inference_model(path='model.pt', precision=None, tolerance=None):
+    """
+    Load the surrogate for serving in the requested precision, falling back
+    to float32 if the reduced-precision model fails validation. Precision
+    and tolerance default to the LANDSCAPE_PRECISION and
+    LANDSCAPE_PRECISION_TOLERANCE environment variables.
+    """
+    net = sr.load_model(path)
+    if precision is None:
+        precision = os.environ.get('LANDSCAPE_PRECISION', 'float32')
+    if tolerance is None:
+        tolerance = float(os.environ.get('LANDSCAPE_PRECISION_TOLERANCE',
+                                         0.005))
+    if precision == 'float32':
+        return net
+    if precision not in precisions:
+        warnings.warn(f'Unknown precision {precision}, expected one of '
+                      f'{precisions}; serving the float32 model')
+        return net
+    try:
+        candidate = quantise(net, precision)
+    except RuntimeError as error:
+        warnings.warn(f'{error}; serving the float32 model')
+        return net
+    report = validate(net, candidate)
+    worst = max(r['r2_loss'] for r in report.values())
+    if worst > tolerance:
+        warnings.warn(f'{precision} inference loses up to {worst:.4f} R\N{SUPERSCRIPT TWO}, '
+                      f'above the tolerance of {tolerance}; serving the float32 model')
+        return net
+    return candidate
+
+
+if __name__ == "__main__":
+    net = sr.load_model('model.pt')
+    for precision in precisions:
+        try:
+            candidate = quantise(net, precision)
+        except RuntimeError as error:
+            print(f'{precision}: {error}')
+            continue
+        latency, throughput = benchmark(candidate)
+        print(f'{precision}: batch-1 latency {latency*1e6:.1f} \N{MICRO SIGN}s, '
+              f'throughput {throughput:,.0f} rows/s')
+        for target, scores in validate(net, candidate).items():
+            print(f'    {target}: ' + ', '.join(f'{k} {v:.5f}'
+                                                for k, v in scores.items()))
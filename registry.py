@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Registry of surrogates the dashboard can switch between.
+
+models.json (or the file named by LANDSCAPE_MODELS) maps a model ID to a
+LandNET artifact, its Pareto set and free-form metadata:
+
+    {"baseline-2015": {"label": "2015 baseline", "surrogate": "model.pt",
+                       "pareto": "data/Pareto_5000.csv",
+                       "description": "miniLUSP 2015 run"}}
+
+The first entry is the default. An entry is loaded the first time any
+session asks for it and then shared by all of them; once the loaded
+entries exceed the memory budget (LANDSCAPE_MODEL_BUDGET_MB) the least
+recently used are dropped, and rebuilt if asked for again.
+"""
+
+import os
+import json
+import weakref
+import threading
+from collections import OrderedDict
+import datastore as ds
+import telemetry as tm
+
+
+default_manifest = {'baseline': {'label': 'LandNET (model.pt)',
+                                 'surrogate': 'model.pt',
+                                 'pareto': 'data/Pareto_5000.csv'}}
+
+
+class ModelEntry:
+    """
+    A loaded surrogate with its serving executor, float copy for gradients,
+    Pareto set and picker, and an estimate of the memory they hold.
+    """
+    def __init__(self, model_id, surrogate='model.pt',
+                 pareto='data/Pareto_5000.csv', label=None, **metadata):
+        import surrogate as sr
+        import quantisation as qn
+        import batching as mb
+        import decision as dc
+        self.id = model_id
+        self.label = label or model_id
+        self.surrogate = surrogate
+        self.metadata = dict(metadata, surrogate=surrogate, pareto=pareto)
+        ### Cached figures depend on the Pareto set as well as the network
+        self.version = ds.file_hash(surrogate)[:16] + ds.file_hash(pareto)[:16]
+        self.net = qn.load_inference_model(surrogate)
+        self.grad_net = sr.load_model(surrogate) if isinstance(
+            self.net, qn.ReducedPrecision) else self.net
+        self.executor = mb.InferenceExecutor(self.net)
+        self.pareto = ds.load_table(pareto)
+        self.picker = dc.ParetoPicker.from_table(self.pareto)
+        self.nbytes = self._memory()
+        ### Stop the inference thread once no session holds the entry
+        weakref.finalize(self, self.executor.close, False)
+
+    def _memory(self):
+        networks = {id(self.net): self.net, id(self.grad_net): self.grad_net}
+        weights = sum(t.numel() * t.element_size() for net in networks.values()
+                      for t in list(net.parameters()) + list(net.buffers()))
+        ### The table's columns are memory maps, so at most their size
+        table = sum(self.pareto[c].nbytes for c in self.pareto.columns)
+        ### Picker arrays plus its two k-d trees, which copy their data
+        picker = sum(a.nbytes for a in (self.picker.X, self.picker.Z,
+                                        self.picker.nF))
+        return weights + table + 2 * picker
+
+
+class ModelRegistry:
+    def __init__(self, manifest=None, budget_mb=None):
+        path = manifest or os.environ.get('LANDSCAPE_MODELS', 'models.json')
+        if isinstance(path, dict):
+            self.manifest = path
+        elif os.path.exists(path):
+            with open(path) as f:
+                self.manifest = json.load(f)
+        else:
+            self.manifest = default_manifest
+        if budget_mb is None:
+            budget_mb = float(os.environ.get('LANDSCAPE_MODEL_BUDGET_MB', 512))
+        self.budget = budget_mb * 2**20
+        self.default = next(iter(self.manifest))
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()
+        self._loading = {}
+        self._lock = threading.Lock()
+
+    def options(self):
+        ### Dropdown options, in manifest order
+        return [{'label': spec.get('label', model_id), 'value': model_id}
+                for model_id, spec in self.manifest.items()]
+
+    def loaded(self):
+        with self._lock:
+            return list(self._entries)
+
+    def _cached(self, model_id):
+        entry = self._entries.get(model_id)
+        if entry is not None:
+            self._entries.move_to_end(model_id)
+            self.hits += 1
+        return entry
+
+    def get(self, model_id=None):
+        """
+        The entry for model_id, loading it if need be. None, or an ID no
+        longer in the manifest (e.g. from a stale session), gives the
+        default model.
+        """
+        if model_id not in self.manifest:
+            model_id = self.default
+        with self._lock:
+            entry = self._cached(model_id)
+            if entry is not None:
+                return entry
+            lock = self._loading.setdefault(model_id, threading.Lock())
+        with lock:
+            with self._lock:
+                entry = self._cached(model_id)
+                if entry is not None:
+                    return entry
+                self.misses += 1
+            entry = ModelEntry(model_id, **self.manifest[model_id])
+            with self._lock:
+                self._entries[model_id] = entry
+                self._evict(keep=model_id)
+        return entry
+
+    def _evict(self, keep):
+        ### Drop least recently used entries, other than keep, over budget
+        while sum(e.nbytes for e in self._entries.values()) > self.budget:
+            victim = next((i for i in self._entries if i != keep), None)
+            if victim is None:
+                break
+            del self._entries[victim]
+
+
+def watch(registry):
+    ### Report the registry's hits and misses with the other caches
+    tm.watch_cache('models', lambda: (registry.hits, registry.misses))
+    return registry
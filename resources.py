@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Models and data the dashboard loads on first use rather than at import.
+
+Each loader runs once, under its own lock, the first time it is called
+from any thread, and returns the same object afterwards. warm_up() loads
+the default model from the registry, with torch, its Pareto set and
+picker, and the hexagon map geometry in a background thread as soon as
+the dashboard module is imported, so the server starts answering
+meanwhile and callbacks arriving early simply wait for what they need.
+Set LANDSCAPE_WARM_UP=0 to skip the warm-up.
+"""
+
+import os
+import time
+import threading
+import functools
+import importlib
+
+
+_loaded = {}
+load_times = {}
+ready = threading.Event()
+
+
+def _once(function):
+    name = function.__name__
+    lock = threading.Lock()
+
+    @functools.wraps(function)
+    def loader():
+        if name not in _loaded:
+            with lock:
+                if name not in _loaded:
+                    start = time.perf_counter()
+                    _loaded[name] = function()
+                    load_times[name] = time.perf_counter() - start
+        return _loaded[name]
+    return loader
+
+
+@_once
+def registry():
+    ### Surrogates and Pareto sets by model ID, loaded as sessions ask
+    import registry as rg
+    return rg.watch(rg.ModelRegistry())
+
+@_once
+def hex_geometry():
+    ### UK hexagons sorted by centroid latitude, to fill from the bottom up
+    import geopandas as gpd
+    geo = gpd.read_file('geogHEXLA.json')
+    geo['centroid_y'] = geo.geometry.centroid.y
+    return geo.sort_values('centroid_y')
+
+
+### Modules only callbacks need, imported ahead of the first request
+deferred_modules = ['improvement', 'sensitivity', 'jobs', 'decision']
+
+def _warm_up():
+    ### ready is set even if a load fails, which then fails on first use
+    try:
+        start = time.perf_counter()
+        registry().get()
+        load_times['default model'] = time.perf_counter() - start
+        hex_geometry()
+        for module in deferred_modules:
+            start = time.perf_counter()
+            importlib.import_module(module)
+            load_times[module] = time.perf_counter() - start
+    finally:
+        ready.set()
+
+def warm_up():
+    ### Unless LANDSCAPE_WARM_UP=0, when everything loads on first use
+    if os.environ.get('LANDSCAPE_WARM_UP', '1') != '0':
+        threading.Thread(target=_warm_up, daemon=True, name='warm-up').start()
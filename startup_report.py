@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Cold-start report for the dashboard.
+
+Imports dashboard.py in fresh interpreters and reports the time until the
+module is imported and the server could start answering, the imports it
+makes broken down by top-level package (from python -X importtime, with
+the background warm-up off so its imports are not mixed in), and how long
+the warm-up in resources.py takes for each model, table and module.
+
+    python startup_report.py [--top 15]
+"""
+
+import sys
+import json
+import argparse
+import subprocess
+
+
+### Import with the warm-up off, so the import times are not mixed with
+### those of the warm-up thread, then load everything in the main thread
+probe = '''
+import json, os, sys, time
+os.environ["LANDSCAPE_WARM_UP"] = "0"
+start = time.perf_counter()
+import dashboard
+imported = time.perf_counter() - start
+import resources
+resources._warm_up()
+print(json.dumps({"imported": imported, "loads": resources.load_times}))
+'''
+### As deployed: until the module is imported, and until the warm-up is done
+ready_probe = '''
+import json, time
+start = time.perf_counter()
+import dashboard
+imported = time.perf_counter() - start
+import resources
+resources.ready.wait()
+print(json.dumps({"imported": imported, "warm": time.perf_counter() - start}))
+'''
+
+
+def parse_importtime(stderr):
+    """
+    Cumulative microseconds and nesting depth of each import, in the order
+    python -X importtime reports them.
+    """
+    imports = []
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        depth = (len(name) - len(name.lstrip())) // 2
+        imports.append((name.strip(), int(cumulative), depth))
+    return imports
+
+def by_package(imports, root='dashboard'):
+    ### Cumulative seconds of the imports made directly by root, by package
+    end = next(i for i, (name, _, _) in enumerate(imports) if name == root)
+    depth = imports[end][2]
+    packages = {}
+    for name, cumulative, d in reversed(imports[:end]):
+        if d <= depth:
+            break
+        if d == depth + 1:
+            package = name.split('.')[0]
+            packages[package] = packages.get(package, 0) + cumulative / 1e6
+    return sorted(packages.items(), key=lambda p: -p[1])
+
+def run():
+    profiled = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', probe],
+        capture_output=True, text=True, check=True)
+    deployed = subprocess.run([sys.executable, '-c', ready_probe],
+                              capture_output=True, text=True, check=True)
+    return (json.loads(profiled.stdout.splitlines()[-1]),
+            json.loads(deployed.stdout.splitlines()[-1]),
+            parse_importtime(profiled.stderr))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Report where the dashboard spends its start-up time.')
+    parser.add_argument('--top', type=int, default=15)
+    args = parser.parse_args(argv)
+    timings, deployed, imports = run()
+    print(f'dashboard imported in {deployed["imported"]:.2f} s, with the '
+          f'warm-up finished at {deployed["warm"]:.2f} s\n')
+    print(f'Imports made by dashboard.py without the warm-up, '
+          f'{timings["imported"]:.2f} s in all (cumulative)')
+    for package, seconds in by_package(imports)[:args.top]:
+        print(f'  {package:<30}{seconds*1e3:>9.0f} ms')
+    print('\nWarm-up loads (resources.py), one after another')
+    for name, seconds in sorted(timings['loads'].items(),
+                                key=lambda l: -l[1]):
+        print(f'  {name:<30}{seconds*1e3:>9.0f} ms')
+
+
+if __name__ == "__main__":
+    main()
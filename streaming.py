@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Chunked streaming ingestion of large miniLUSP output files.
+
+The CSV is read in chunks; each chunk is validated, scenarios already seen
+are dropped, and the surviving rows are packed into fixed-size float32
+shards of features and targets on disk. ShardDataset then streams those
+shards back as shuffled mini-batches, so training memory is bounded by the
+shard and batch sizes rather than by the size of the source file.
+"""
+
+import os
+import json
+import numpy as np
+import pandas as pd
+import torch
+import surrogate as sr
+from torch.utils.data import IterableDataset, DataLoader, get_worker_info
+
+
+feature_columns = ['ambition_grassland', 'ambition_organic',
+                   'ambition_peatland_lo', 'ambition_peatland_up',
+                   'ambition_silvoa', 'ambition_silvop', 'ambition_woodland',
+                   'ambition_woodpa']
+target_columns = ['gwp_rel', 'food_rel', 'birds_rel']
+
+
+class SeenScenarios:
+    """
+    Bitmap of scenario ids already ingested, growing as larger ids arrive.
+    Ten million scenarios need just over a megabyte. Ids above max_id are
+    refused, so that one stray id cannot make the bitmap arbitrarily large:
+    the default bound of 10^8 caps it at 12.5 MB.
+    """
+    def __init__(self, capacity=1 << 20, max_id=10**8):
+        self.max_id = max_id
+        self.bits = np.zeros(min(capacity, max_id + 1) // 8 + 1,
+                             dtype=np.uint8)
+
+    def first_sightings(self, ids):
+        ### Mask of ids not seen before, including repeats within the batch
+        ids = np.asarray(ids, dtype=np.int64)
+        if ids.size and (ids.min() < 0 or ids.max() > self.max_id):
+            raise ValueError(f'Scenario ids must be within [0, {self.max_id}]')
+        if ids.size and ids.max() // 8 >= len(self.bits):
+            grown = np.zeros(min(max(2 * len(self.bits), ids.max() // 8 + 1),
+                                 self.max_id // 8 + 1), dtype=np.uint8)
+            grown[:len(self.bits)] = self.bits
+            self.bits = grown
+        byte, bit = ids // 8, (ids % 8).astype(np.uint8)
+        seen = (self.bits[byte] >> bit) & 1
+        _, first = np.unique(ids, return_index=True)
+        fresh = np.zeros(len(ids), dtype=bool)
+        fresh[first] = True
+        fresh &= seen == 0
+        masks = np.left_shift(1, bit[fresh]).astype(np.uint8)
+        np.bitwise_or.at(self.bits, byte[fresh], masks)
+        return fresh
+
+
+def validate_chunk(chunk, max_id=10**8):
+    """
+    Keep rows with complete, finite values, ambitions within [0, 1] and
+    integer scenario ids within [0, max_id], returning them with a count of
+    the rows rejected.
+    """
+    required = ['scenario'] + feature_columns + target_columns
+    missing = set(required) - set(chunk.columns)
+    if missing:
+        raise ValueError(f"miniLUSP output is missing columns {sorted(missing)}")
+    values = chunk[feature_columns + target_columns].to_numpy(dtype=float)
+    ambitions = values[:,:len(feature_columns)]
+    ### A negative id would index the bitmap of seen scenarios from the end
+    ids = pd.to_numeric(chunk['scenario'], errors='coerce').to_numpy(dtype=float)
+    valid = (np.isfinite(values).all(axis=1)
+             & (ambitions >= 0).all(axis=1) & (ambitions <= 1).all(axis=1)
+             & np.isfinite(ids) & (ids >= 0) & (ids <= max_id)
+             & (ids == np.floor(ids)))
+    return chunk[valid], int((~valid).sum())
+
+
+def ingest(path, output='data/shards', shard_rows=65536, chunksize=100000,
+           max_id=10**8):
+    """
+    Stream a miniLUSP output CSV into shards of shard_rows rows, each a
+    float32 .npy array of the eight features followed by the three targets,
+    and write a manifest describing them. Rows with scenario ids above
+    max_id are counted as invalid.
+    """
+    os.makedirs(output, exist_ok=True)
+    seen = SeenScenarios(max_id=max_id)
+    pending, n_pending = [], 0
+    shards, stats = [], {'rows_read': 0, 'invalid': 0, 'duplicates': 0}
+
+    def write(block):
+        name = f'shard_{len(shards):06d}.npy'
+        np.save(os.path.join(output, name), block)
+        shards.append({'file': name, 'rows': len(block)})
+
+    for chunk in pd.read_csv(path, chunksize=chunksize):
+        stats['rows_read'] += len(chunk)
+        chunk, invalid = validate_chunk(chunk, max_id)
+        stats['invalid'] += invalid
+        fresh = seen.first_sightings(chunk['scenario'].to_numpy())
+        stats['duplicates'] += int((~fresh).sum())
+        block = chunk[fresh][feature_columns + target_columns].to_numpy(
+            dtype=np.float32)
+        pending.append(block)
+        n_pending += len(block)
+        while n_pending >= shard_rows:
+            stacked = np.concatenate(pending)
+            write(stacked[:shard_rows])
+            pending, n_pending = [stacked[shard_rows:]], n_pending - shard_rows
+    if n_pending:
+        write(np.concatenate(pending))
+    manifest = {'source': os.path.abspath(path), 'shard_rows': shard_rows,
+                'features': feature_columns, 'targets': target_columns,
+                'shards': shards, **stats}
+    with open(os.path.join(output, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=1)
+    return manifest
+
+
+class ShardDataset(IterableDataset):
+    """
+    Iterable mini-batches over the shards written by ingest(). Shard order
+    and rows within each shard are reshuffled every pass, shards are split
+    between DataLoader workers, and only one shard per worker is memory
+    mapped at a time.
+    """
+    def __init__(self, directory='data/shards', batch_size=1024, seed=42):
+        with open(os.path.join(directory, 'manifest.json')) as f:
+            self.manifest = json.load(f)
+        self.directory = directory
+        self.batch_size = batch_size
+        self.seed = seed
+        self.epoch = 0
+        self.n_features = len(self.manifest['features'])
+
+    def __len__(self):
+        return sum(-(-s['rows'] // self.batch_size)
+                   for s in self.manifest['shards'])
+
+    def __iter__(self):
+        rng = np.random.default_rng(self.seed + self.epoch)
+        self.epoch += 1
+        shards = [self.manifest['shards'][i]
+                  for i in rng.permutation(len(self.manifest['shards']))]
+        worker = get_worker_info()
+        if worker is not None:
+            shards = shards[worker.id::worker.num_workers]
+        for shard in shards:
+            block = np.load(os.path.join(self.directory, shard['file']),
+                            mmap_mode='r')
+            order = rng.permutation(len(block))
+            for i in range(0, len(order), self.batch_size):
+                rows = np.sort(order[i:i+self.batch_size])
+                batch = torch.from_numpy(np.ascontiguousarray(block[rows]))
+                yield batch[:,:self.n_features], batch[:,self.n_features:]
+
+
+def train_streaming(directory='data/shards', epochs=50, batch_size=1024,
+                    num_workers=0, lr=0.0005):
+    dataset = ShardDataset(directory, batch_size)
+    loader = DataLoader(dataset, batch_size=None, num_workers=num_workers,
+                        persistent_workers=num_workers > 0)
+    torch.manual_seed(42)
+    net = sr.LandNET(dataset.n_features, len(dataset.manifest['targets']))
+    net.apply(sr.init_weights)
+    sr.minibatch_training(net, loader, torch.device('cpu'), epochs=epochs,
+                          lr=lr)
+    return net
+
+
+if __name__ == "__main__":
+    manifest = ingest('data/miniLUSP_output.csv')
+    print({k: v for k, v in manifest.items() if k != 'shards'})
+    net = train_streaming()
+    torch.save(net, 'model_streaming.pt')
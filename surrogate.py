@@ -6,24 +6,25 @@ Created on Tue Mar 11 15:19:05 2025
 @author: robertrouse
 """
 
+import numpy as np
+import torch
 import torch.nn as nn 
 import torch.optim as tt
 
 ### Define Neural Network structure and initialisation procedure
 class LandNET(nn.Module):
-    def __init__(self, in_dim, out_dim):
+    def __init__(self, in_dim, out_dim, widths=(256, 64, 16)):
         super(LandNET, self).__init__()
         self.in_dim = in_dim
         self.out_dim = out_dim
-        self.linear_layers = nn.Sequential(
-            nn.Linear(in_dim, 256),
-            nn.SiLU(),
-            nn.Linear(256, 64),
-            nn.SiLU(),
-            nn.Linear(64, 16),
-            nn.SiLU(),
-            nn.Linear(16, out_dim),
-            )
+        self.widths = tuple(widths)
+        layers = []
+        fan_in = in_dim
+        for width in self.widths:
+            layers += [nn.Linear(fan_in, width), nn.SiLU()]
+            fan_in = width
+        layers.append(nn.Linear(fan_in, out_dim))
+        self.linear_layers = nn.Sequential(*layers)
     
     def forward(self, z):
         z = self.linear_layers(z)
@@ -37,10 +38,11 @@ def init_weights(m: nn.Module):
         nn.init.xavier_uniform_(m.weight)
 
 def training(m, x, y, device, epochs=16000, opt=tt.Adam, lr=0.0005, decay=0,
-             reporting_interval=500):
+             reporting_interval=500, optimizer=None):
     m = m.train()
     m = m.to(device)
-    optimizer = opt(m.parameters(), lr=lr, weight_decay=decay)
+    if optimizer is None:
+        optimizer = opt(m.parameters(), lr=lr, weight_decay=decay)
     loss_func = nn.MSELoss()
     loss_list = []
     for i in range(epochs):
@@ -50,6 +52,50 @@ def training(m, x, y, device, epochs=16000, opt=tt.Adam, lr=0.0005, decay=0,
         loss.backward()
         optimizer.step()
         loss_list.append(loss.data)
-        if(i % reporting_interval == 0):
+        if(reporting_interval and i % reporting_interval == 0):
             print('epoch {}, loss {}'.format(i, loss.data))
-    m.eval()
\ No newline at end of file
+    m.eval()
+    return loss_list
+
+def minibatch_training(m, batches, device, epochs=100, opt=tt.Adam, lr=0.0005,
+                       decay=0, reporting_interval=10, optimizer=None):
+    m = m.train()
+    m = m.to(device)
+    if optimizer is None:
+        optimizer = opt(m.parameters(), lr=lr, weight_decay=decay)
+    loss_func = nn.MSELoss()
+    loss_list = []
+    for i in range(epochs):
+        total, rows = 0.0, 0
+        for x, y in batches:
+            y_pred = m(x.to(device).float())
+            loss = loss_func(y_pred, y.to(device).float())
+            m.zero_grad()
+            loss.backward()
+            optimizer.step()
+            total += loss.item() * len(x)
+            rows += len(x)
+        loss_list.append(total / max(rows, 1))
+        if(reporting_interval and i % reporting_interval == 0):
+            print('epoch {}, loss {}'.format(i, loss_list[-1]))
+    m.eval()
+    return loss_list
+
+def unwrap(m):
+    ### Strip DataParallel/DistributedDataParallel wrappers from a network
+    while isinstance(m, (nn.DataParallel, nn.parallel.DistributedDataParallel)):
+        m = m.module
+    return m
+
+def load_model(path='model.pt', device='cpu'):
+    net = unwrap(torch.load(path, map_location=device, weights_only=False))
+    net.eval()
+    return net
+
+def predict(m, x):
+    ### Evaluate a torch network or a NumPy student such as
+    ### distillation.PolynomialSurrogate on an array of scenarios
+    if isinstance(m, nn.Module):
+        with torch.no_grad():
+            return m(torch.as_tensor(x, dtype=torch.float32)).numpy()
+    return m.predict(np.asarray(x, dtype=float))
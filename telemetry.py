@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Prometheus metrics for the dashboard server.
+
+Histograms and counters are plain in-process tallies: recording a value is
+a bucket search and an increment under a lock, and nothing is formatted
+until /metrics is scraped, so the cost when nobody is scraping is a
+microsecond or so per observation. The endpoint serves the Prometheus text
+exposition format (version 0.0.4) without needing prometheus_client.
+"""
+
+import time
+import bisect
+import threading
+import functools
+
+
+latency_buckets = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+                   1, 2.5, 5, 10)
+byte_buckets = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6)
+count_buckets = (0, 1, 2, 3, 5, 8, 13, 21)
+
+### Every metric, in the order they are exposed
+metrics = []
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+def _labels(names, values):
+    if not names:
+        return ''
+    pairs = (f'{n}="{_escape(v)}"' for n, v in zip(names, values))
+    return '{' + ','.join(pairs) + '}'
+
+def _number(value):
+    return '+Inf' if value == float('inf') else repr(float(value))
+
+
+class Histogram:
+    def __init__(self, name, documentation, labelnames=(),
+                 buckets=latency_buckets):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+        metrics.append(self)
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1),
+                                                 0.0]
+            series[0][i] += 1
+            series[1] += value
+
+    def time(self, *labels):
+        return _Timer(self, labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}',
+                 f'# TYPE {self.name} histogram']
+        with self._lock:
+            series = [(k, list(v[0]), v[1]) for k, v in self._series.items()]
+        for labels, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), counts):
+                cumulative += count
+                le = _labels(self.labelnames + ('le',),
+                             labels + (_number(bound),))
+                lines.append(f'{self.name}_bucket{le} {cumulative}')
+            tags = _labels(self.labelnames, labels)
+            lines.append(f'{self.name}_sum{tags} {_number(total)}')
+            lines.append(f'{self.name}_count{tags} {cumulative}')
+        return lines
+
+class _Timer:
+    def __init__(self, histogram, labels):
+        self.histogram, self.labels = histogram, labels
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.histogram.observe(time.perf_counter() - self.start, *self.labels)
+
+
+class Counter:
+    ### Increments from the code, or totals read from function at scrape time
+    def __init__(self, name, documentation, labelnames=(), kind='counter'):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.kind = kind
+        self.functions = []
+        self._values = {}
+        self._lock = threading.Lock()
+        metrics.append(self)
+
+    def inc(self, amount=1, *labels):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def dec(self, amount=1, *labels):
+        self.inc(-amount, *labels)
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for function in self.functions:
+            for labels, value in function().items():
+                values[labels] = values.get(labels, 0) + value
+        return values
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}',
+                 f'# TYPE {self.name} {self.kind}']
+        for labels, value in sorted(self.samples().items()):
+            lines.append(f'{self.name}{_labels(self.labelnames, labels)} '
+                         f'{_number(value)}')
+        return lines
+
+def Gauge(name, documentation, labelnames=(), function=None):
+    gauge = Counter(name, documentation, labelnames, kind='gauge')
+    if function is not None:
+        gauge.functions.append(function)
+    return gauge
+
+
+def timed(histogram, *labels):
+    ### Decorator recording each call's duration in histogram
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            with histogram.time(*labels):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+### Caches report lookups as (hits, misses) at scrape time
+_cache_sources = {}
+
+def watch_cache(name, function):
+    _cache_sources[name] = function
+
+def _cache_totals():
+    totals = {}
+    for name, function in _cache_sources.items():
+        hits, misses = function()
+        totals[(name, 'hit')], totals[(name, 'miss')] = hits, misses
+    return totals
+
+def _hit_ratios():
+    totals = cache_requests.samples()
+    caches = {cache for cache, _ in totals}
+    ratios = {}
+    for cache in caches:
+        hits, misses = totals.get((cache, 'hit'), 0), totals.get((cache, 'miss'), 0)
+        if hits + misses:
+            ratios[(cache,)] = hits / (hits + misses)
+    return ratios
+
+def _resident_memory():
+    import psutil
+    return {(): psutil.Process().memory_info().rss}
+
+
+### Dashboard metrics
+callback_seconds = Histogram('landscape_callback_seconds',
+                             'Dash callback request latency', ('callback',))
+response_bytes = Histogram('landscape_callback_response_bytes',
+                           'Dash callback response payload size',
+                           ('callback',), byte_buckets)
+forward_seconds = Histogram('landscape_forward_seconds',
+                            'Surrogate forward pass time per batch')
+map_seconds = Histogram('landscape_map_build_seconds',
+                        'Hexagon map figure build time')
+enforcement_iterations = Histogram(
+    'landscape_constraint_enforcement_iterations',
+    'Constraints rebalanced per slider update', buckets=count_buckets)
+cache_requests = Counter('landscape_cache_requests_total',
+                         'Cache lookups by result', ('cache', 'result'))
+cache_requests.functions.append(_cache_totals)
+cache_hit_ratio = Gauge('landscape_cache_hit_ratio',
+                        'Fraction of cache lookups that hit', ('cache',),
+                        _hit_ratios)
+in_flight = Gauge('landscape_requests_in_flight',
+                  'HTTP requests being served')
+resident_memory = Gauge('landscape_process_resident_memory_bytes',
+                        'Resident set size of the server process',
+                        function=_resident_memory)
+
+
+def render():
+    return '\n'.join(line for m in metrics for line in m.render()) + '\n'
+
+
+def register(app, route='/metrics'):
+    """
+    Serve /metrics from a Dash app's Flask server and time every callback
+    request, labelled with the name of the callback function.
+    """
+    from flask import Response, request, g
+    server = app.server
+    names = {}
+
+    def callback_name():
+        ### Only outputs the app registered are remembered or labelled, so
+        ### arbitrary requests cannot grow the cache or the label set
+        payload = request.get_json(silent=True)
+        output = payload.get('output') if isinstance(payload, dict) else None
+        if not isinstance(output, str) or output not in app.callback_map:
+            return 'unknown'
+        if output not in names:
+            names[output] = getattr(app.callback_map[output].get('callback'),
+                                    '__name__', 'unknown')
+        return names[output]
+
+    @server.before_request
+    def start_request():
+        in_flight.inc()
+        g.telemetry_start = time.perf_counter()
+
+    @server.after_request
+    def record_request(response):
+        if request.path.endswith('_dash-update-component'):
+            name = callback_name()
+            callback_seconds.observe(
+                time.perf_counter() - g.telemetry_start, name)
+            if response.content_length is not None:
+                response_bytes.observe(response.content_length, name)
+        return response
+
+    @server.teardown_request
+    def finish_request(error=None):
+        if 'telemetry_start' in g:
+            in_flight.dec()
+
+    @server.route(route)
+    def serve_metrics():
+        return Response(render(), mimetype='text/plain; version=0.0.4')
+
+    return serve_metrics
@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+Fronts from the optimisers must satisfy every land-use constraint.
+
+    python -m pytest tests
+"""
+
+import os
+import sys
+import numpy as np
+import pytest
+
+root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, root)
+
+import optimiser as op
+from constraints import constraint_matrix, constraint_bounds
+
+
+@pytest.fixture(autouse=True)
+def in_root(monkeypatch):
+    monkeypatch.chdir(root)
+
+
+def land_use_feasible(X, tol=1e-6):
+    return np.all(X @ constraint_matrix.T <= constraint_bounds + tol, axis=1)
+
+
+def test_tensor_front_is_land_use_feasible():
+    config = op.OptimizerConfig(population_size=200, offspring=200,
+                                max_generations=50, device='cpu')
+    X, F = op.TensorNSGA2(op.load_surrogate(config), config).run()
+    assert len(X)
+    assert land_use_feasible(X).all()
+
+
+def test_problem_counts_every_land_use_constraint():
+    config = op.OptimizerConfig(device='cpu')
+    problem = op.LandscapeOptimisation(op.load_surrogate(config))
+    assert problem.n_ieq_constr == len(constraint_bounds) + 2
+    ### Silvopastoral at its bound with full grassland breaks a constraint
+    x = np.array([1, 0, 0, 0, 0, 0.35, 0, 0], dtype=float)
+    out = {}
+    problem._evaluate(x, out)
+    assert len(out['G']) == problem.n_ieq_constr
+    assert max(out['G'][:len(constraint_bounds)]) > 0
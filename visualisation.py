@@ -4,8 +4,8 @@ Created on Wed Mar 19 13:47:59 2025
 @author: robertrouse
 """
 
+import numpy as np
 import plotly.graph_objects as pg
-import plotly.express as px
 
 
 def single_dumbell(label, base, update, limits, colorscale, scaling=[0, 0.5, 1]):
@@ -48,22 +48,115 @@ def single_dumbell(label, base, update, limits, colorscale, scaling=[0, 0.5, 1])
         )
     return fig
 
-def dashboard_pareto_scatter(label, pareto_x, pareto_y, pareto_z, 
+def dashboard_pareto_scatter(label, pareto_x, pareto_y, pareto_z,
                              new_x, new_y,
-                             limits, colorscale, scaling=[0, 0.5, 1]):    
-    fig_a = px.scatter(x=new_x, y=new_y)
-    fig_a.update_traces(marker=dict(size=20, color='black',
-                                    symbol="x"))
-    
-    fig_b = px.scatter(x=pareto_x, y=pareto_y)
-    fig_b.update_traces(marker=dict(size=2.5, color=pareto_z, 
-                                  colorscale=[[scaling[0], colorscale[0]],
-                                              [scaling[1], colorscale[1]],
-                                              [scaling[2], colorscale[2]]],
-                                  cmin=limits[0],
-                                  cmax=limits[1],
-                                  showscale=True,
-                                  colorbar_x=-0.3), opacity=0.4
-                     )
-    fig = pg.Figure(data=fig_a.data + fig_b.data)
-    return fig
\ No newline at end of file
+                             limits, colorscale, scaling=[0, 0.5, 1],
+                             highlight_x=None, highlight_y=None,
+                             candidate_x=None, candidate_y=None,
+                             webgl=False, budget=None):
+    ### Front, scenario, nearest alternative and candidates, in SVG or with
+    ### webgl=True in WebGL; a budget thins the front to that many points.
+    ### The front is always trace 1, for refine_pareto_trace
+    trace = pg.Scattergl if webgl else pg.Scatter
+    fig = pg.Figure()
+    fig.add_trace(trace(x=np.asarray(new_x), y=np.asarray(new_y),
+                        mode='markers', showlegend=False,
+                        marker=dict(size=20, color='black', symbol='x')))
+    fig.add_trace(trace(mode='markers', showlegend=False, opacity=0.4,
+                        marker=dict(size=2.5,
+                                    colorscale=[[scaling[0], colorscale[0]],
+                                                [scaling[1], colorscale[1]],
+                                                [scaling[2], colorscale[2]]],
+                                    cmin=limits[0],
+                                    cmax=limits[1],
+                                    showscale=True,
+                                    colorbar_x=-0.3)))
+    refine_pareto_trace(fig, pareto_x, pareto_y, pareto_z, budget)
+    if highlight_x is not None:
+        fig.add_trace(trace(x=np.asarray(highlight_x),
+                            y=np.asarray(highlight_y),
+                            mode='markers', showlegend=False,
+                            marker=dict(size=16, color='black',
+                                        symbol='diamond-open',
+                                        line=dict(width=3))))
+    if candidate_x is not None and len(candidate_x):
+        fig.add_trace(trace(x=np.asarray(candidate_x),
+                            y=np.asarray(candidate_y),
+                            mode='markers', showlegend=False,
+                            marker=dict(size=14, color='#3D563A',
+                                        symbol='star',
+                                        line=dict(width=1, color='black'))))
+    return fig
+
+def thin_to_budget(x, y, budget=5000, x_range=None, y_range=None):
+    """
+    Indices, in their original order, of at most budget of the points
+    (x, y) within the view: all of them if they fit or budget is None,
+    otherwise one per occupied cell of the finest square grid over the view
+    that stays within budget, so dense regions are thinned and sparse ones
+    kept.
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    inside = np.isfinite(x) & np.isfinite(y)
+    if x_range is not None:
+        inside &= (x >= min(x_range)) & (x <= max(x_range))
+    if y_range is not None:
+        inside &= (y >= min(y_range)) & (y <= max(y_range))
+    index = np.flatnonzero(inside)
+    if budget is None or len(index) <= budget:
+        return index
+    ### Coordinates scaled to the unit square of the points in view
+    u, v = x[index], y[index]
+    u = (u - u.min()) / (np.ptp(u) or 1)
+    v = (v - v.min()) / (np.ptp(v) or 1)
+    side = max(int(np.sqrt(budget)), 1)
+    kept = None
+    for _ in range(12):
+        cells = (np.minimum((u * side).astype(np.int64), side - 1) * side
+                 + np.minimum((v * side).astype(np.int64), side - 1))
+        _, first = np.unique(cells, return_index=True)
+        if len(first) > budget:
+            break
+        kept = first
+        ### A front fills few of the cells, so refine while it is sparse
+        if len(first) > 0.7 * budget:
+            break
+        side = int(side * 1.4) + 1
+    return index[np.sort(kept)]
+
+def dashboard_pareto_scattergl(*args, budget=5000, **kwargs):
+    ### dashboard_pareto_scatter on WebGL, drawing at most budget points
+    return dashboard_pareto_scatter(*args, webgl=True, budget=budget,
+                                    **kwargs)
+
+def refine_pareto_trace(fig, pareto_x, pareto_y, pareto_z, budget=5000,
+                        x_range=None, y_range=None):
+    """
+    Fill the front trace of a dashboard_pareto_scatter figure, or a
+    dash.Patch of one, with the front thinned to budget points within the
+    view, as float32 so the payload stays small.
+    """
+    index = thin_to_budget(pareto_x, pareto_y, budget, x_range, y_range)
+    trace = fig['data'][1]
+    trace['x'] = np.asarray(pareto_x, dtype=np.float32)[index]
+    trace['y'] = np.asarray(pareto_y, dtype=np.float32)[index]
+    trace['marker']['color'] = np.asarray(pareto_z, dtype=np.float32)[index]
+    return fig
+
+def response_sparkline(levels, curves, feasible, current, reference,
+                       labels=['CO2e', 'Food', 'Birds'],
+                       colours=['#8B424B', '#CCA857', '#7DB567']):
+    fig = pg.Figure()
+    for i, (label, colour) in enumerate(zip(labels, colours)):
+        change = np.where(feasible, curves[:,i] - reference[i], np.nan)
+        fig.add_trace(pg.Scatter(x=levels, y=change, mode='lines',
+                                 name=label, line=dict(color=colour, width=1.5),
+                                 showlegend=False))
+    fig.add_vline(x=current, line=dict(color='black', width=1))
+    fig.update_layout(plot_bgcolor='white', margin=dict(l=0, r=0, t=0, b=0),
+                      height=60,
+                      xaxis=dict(range=[0, 1], visible=False, fixedrange=True),
+                      yaxis=dict(visible=False, fixedrange=True,
+                                 zeroline=True, zerolinecolor='#C3C3C3'))
+    return fig